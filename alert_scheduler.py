@@ -0,0 +1,308 @@
+import asyncio
+import contextvars
+import heapq
+import os
+import time
+from collections import deque
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+from telegram.ext import BaseRateLimiter
+
+from metrics import Counter, Gauge, Histogram
+import subscriptions
+
+# Limites Telegram : ~30 messages/s pour le bot, ~1 message/s par chat privé (marge de sécurité incluse).
+# Le bucket global (capacité 1, pas de rafale) compte tous les messages du bot, pas seulement les DMs.
+DM_GLOBAL_RATE = float(os.getenv("DM_GLOBAL_RATE", "25"))
+DM_CHAT_RATE = float(os.getenv("DM_CHAT_RATE", "1"))
+DM_CHAT_BURST = float(os.getenv("DM_CHAT_BURST", "1"))
+# Une alerte non livrée après ce délai n'est plus envoyée (secondes)
+DM_ALERT_MAX_AGE = float(os.getenv("DM_ALERT_MAX_AGE", "120"))
+# Envois Telegram en vol au plus
+DM_MAX_IN_FLIGHT = int(os.getenv("DM_MAX_IN_FLIGHT", "32"))
+# Tentatives par message en cas d'erreur réseau
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 1.0
+# Au-delà, les buckets par chat pleins (inactifs) sont oubliés
+MAX_CHAT_BUCKETS = 10_000
+# Méthodes de l'API Bot qui comptent dans la limite globale de messages
+MESSAGE_ENDPOINTS = ("send", "edit", "copy", "forward")
+
+# Vrai dans les tâches d'envoi du scheduler : leur jeton global est déjà pris
+_scheduled = contextvars.ContextVar("dm_scheduled", default=False)
+
+DM_SENDS = Counter("dm_alert_sends_total", "Alert DMs by outcome.", ["outcome"])
+DM_DROPPED = Counter("dm_alerts_dropped_total", "Alert DMs dropped because the alert got older than DM_ALERT_MAX_AGE.")
+DM_DELIVERY_SECONDS = Histogram(
+    "dm_alert_delivery_seconds", "Time from alert submission to DM delivery.",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+
+
+class TokenBucket:
+    """`rate` tokens per second, at most `capacity` saved up."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _fill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, now):
+        """Seconds until a token is available (0 if one is available now)."""
+        self._fill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._fill(now)
+        self.tokens -= 1
+
+    def full(self, now):
+        self._fill(now)
+        return self.tokens >= self.capacity
+
+
+def _seconds(retry_after):
+    # RetryAfter.retry_after est un int ou un timedelta selon la configuration de PTB
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+class _Alert:
+    __slots__ = ("text", "reply_markup", "created_at", "pending", "deferred", "attempts", "in_flight")
+
+    def __init__(self, chat_ids, text, reply_markup):
+        self.text = text
+        self.reply_markup = reply_markup
+        self.created_at = time.monotonic()
+        self.pending = deque(chat_ids)
+        self.deferred = []  # tas de (prêt_à, chat_id) : chats limités ou envois à retenter
+        self.attempts = {}
+        self.in_flight = 0
+
+    def __len__(self):
+        return len(self.pending) + len(self.deferred)
+
+
+class AlertScheduler:
+    """
+    Fans alerts out to subscriber chats by DM within Telegram's rate limits.
+
+    A global token bucket caps the bot's send rate and one bucket per chat caps
+    each conversation. Other bot messages take their global token through
+    TelegramRateLimiter and go before queued DMs. The newest alert is always
+    served first, so a burst of launches delays older alerts rather than the
+    latest one; alerts still not delivered after DM_ALERT_MAX_AGE are dropped.
+    A 429 pauses every send for its retry_after; chats that blocked the bot are
+    unsubscribed.
+    """
+
+    def __init__(self, global_rate=DM_GLOBAL_RATE, chat_rate=DM_CHAT_RATE, chat_burst=DM_CHAT_BURST,
+                 max_age=DM_ALERT_MAX_AGE, max_in_flight=DM_MAX_IN_FLIGHT):
+        # Capacité 1 : envois espacés d'au moins 1/global_rate, jamais plus de global_rate par seconde
+        self.global_bucket = TokenBucket(global_rate, 1)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_age = max_age
+        self.bot = None
+        self._alerts = []  # de la plus ancienne à la plus récente
+        self._chat_buckets = {}
+        self._paused_until = 0.0
+        self._waiting = 0  # autres envois du bot en attente d'un jeton global
+        self._wakeup = asyncio.Event()
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._sends = set()
+        self._task = None
+
+    def __len__(self):
+        return sum(len(alert) for alert in self._alerts)
+
+    def submit(self, chat_ids, text, reply_markup=None):
+        """Queues one alert for `chat_ids`; returns immediately."""
+        if not chat_ids or self.bot is None:
+            return
+        self._alerts.append(_Alert(chat_ids, text, reply_markup))
+        self._wakeup.set()
+
+    def pause(self, seconds):
+        """Suspends every send (DMs and other bot messages) after a 429."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """Waits for a global token for a bot message sent outside the scheduler; served before queued DMs."""
+        self._waiting += 1
+        try:
+            while True:
+                now = time.monotonic()
+                wait = max(self._paused_until - now, self.global_bucket.delay(now))
+                if wait <= 0:
+                    self.global_bucket.take(now)
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            self._waiting -= 1
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _prune(self, now):
+        kept = []
+        for alert in self._alerts:
+            if alert.in_flight:
+                kept.append(alert)
+            elif now - alert.created_at > self.max_age:
+                DM_DROPPED.inc(len(alert))
+            elif len(alert):
+                kept.append(alert)
+        self._alerts = kept
+        if len(self._chat_buckets) > MAX_CHAT_BUCKETS:
+            self._chat_buckets = {c: b for c, b in self._chat_buckets.items() if not b.full(now)}
+
+    def _next(self, now):
+        """Returns (alert, chat_id, None) for the next send, or (None, None, earliest ready time or None)."""
+        earliest = None
+        for alert in reversed(self._alerts):
+            if now - alert.created_at > self.max_age:
+                continue
+            while alert.deferred and alert.deferred[0][0] <= now:
+                _, chat_id = heapq.heappop(alert.deferred)
+                wait = self._chat_bucket(chat_id).delay(now)
+                if wait <= 0:
+                    return alert, chat_id, None
+                heapq.heappush(alert.deferred, (now + wait, chat_id))
+            while alert.pending:
+                chat_id = alert.pending.popleft()
+                wait = self._chat_bucket(chat_id).delay(now)
+                if wait <= 0:
+                    return alert, chat_id, None
+                # Chat déjà servi récemment (alerte plus récente) : repris quand son bucket le permet
+                heapq.heappush(alert.deferred, (now + wait, chat_id))
+            if alert.deferred and (earliest is None or alert.deferred[0][0] < earliest):
+                earliest = alert.deferred[0][0]
+        return None, None, earliest
+
+    async def _run(self):
+        while True:
+            await self._in_flight.acquire()
+            now = time.monotonic()
+            self._prune(now)
+            wait = max(self._paused_until - now, self.global_bucket.delay(now))
+            if self._waiting:
+                # Alerte du canal, réponses de sweep, éditions : prioritaires sur les DMs
+                wait = max(wait, 1 / self.global_bucket.rate)
+            if wait > 0:
+                self._in_flight.release()
+                await asyncio.sleep(wait)
+                continue
+            alert, chat_id, earliest = self._next(now)
+            if alert is None:
+                self._in_flight.release()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), None if earliest is None else earliest - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.global_bucket.take(now)
+            self._chat_bucket(chat_id).take(now)
+            alert.in_flight += 1
+            task = asyncio.ensure_future(self._send(alert, chat_id))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    def _retry(self, alert, chat_id, at):
+        heapq.heappush(alert.deferred, (at, chat_id))
+
+    async def _send(self, alert, chat_id):
+        _scheduled.set(True)
+        try:
+            await self.bot.send_message(
+                chat_id=chat_id, text=alert.text, parse_mode="Markdown", reply_markup=alert.reply_markup
+            )
+            DM_SENDS.inc(outcome="sent")
+            DM_DELIVERY_SECONDS.observe(time.monotonic() - alert.created_at)
+        except RetryAfter as e:
+            # Limite dépassée : tous les envois sont suspendus le temps demandé par Telegram
+            DM_SENDS.inc(outcome="retry_after")
+            self.pause(_seconds(e.retry_after))
+            self._retry(alert, chat_id, self._paused_until)
+        except Forbidden:
+            # Bot bloqué ou chat supprimé : l'abonnement est retiré
+            DM_SENDS.inc(outcome="blocked")
+            await asyncio.to_thread(subscriptions.unsubscribe, chat_id)
+        except BadRequest as e:
+            DM_SENDS.inc(outcome="failed")
+            print(f"Alerte refusée pour le chat {chat_id} : {e}")
+        except NetworkError as e:
+            attempts = alert.attempts[chat_id] = alert.attempts.get(chat_id, 0) + 1
+            if attempts < MAX_ATTEMPTS:
+                DM_SENDS.inc(outcome="retried")
+                self._retry(alert, chat_id, time.monotonic() + RETRY_DELAY * attempts)
+            else:
+                DM_SENDS.inc(outcome="failed")
+                print(f"Erreur réseau lors de l'envoi de l'alerte au chat {chat_id} : {e}")
+        except TelegramError as e:
+            DM_SENDS.inc(outcome="failed")
+            print(f"Erreur lors de l'envoi de l'alerte au chat {chat_id} : {e}")
+        finally:
+            alert.in_flight -= 1
+            self._in_flight.release()
+            self._wakeup.set()
+
+    def start(self, bot):
+        self.bot = bot
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._sends):
+            task.cancel()
+        await asyncio.gather(*self._sends, return_exceptions=True)
+
+
+class TelegramRateLimiter(BaseRateLimiter):
+    """
+    PTB rate limiter that makes every message the bot sends (channel alert,
+    sweep replies, confirmation edits) take a token from the scheduler's
+    global bucket, and pauses everything on a 429.
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if endpoint.startswith(MESSAGE_ENDPOINTS) and not _scheduled.get():
+            await self.scheduler.acquire()
+        try:
+            return await callback(*args, **kwargs)
+        except RetryAfter as e:
+            # Le scheduler gère lui-même les 429 de ses DMs
+            if not _scheduled.get():
+                self.scheduler.pause(_seconds(e.retry_after))
+            raise
+
+
+alert_scheduler = AlertScheduler()
+Gauge("dm_alert_queue", "Alert DMs waiting to be sent.", fn=lambda: len(alert_scheduler))
+Gauge("dm_subscribers", "Chats subscribed to alerts.", fn=lambda: len(subscriptions.subscription_index))
@@ -0,0 +1,247 @@
+import os
+import time
+import threading
+from dataclasses import dataclass
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from storage import get_connection
+from utils import is_valid_solana_address, address_exists
+import keystore
+
+AUTOSWEEP_DB = os.getenv("AUTOSWEEP_DB", "data/autosweep.db")
+# Règle appliquée à tous les ruggers (une règle spécifique à un rugger est prioritaire)
+ALL_RUGGERS = "*"
+# Garde-fous sur les règles saisies par les utilisateurs
+MAX_AMOUNT = float(os.getenv("AUTOSWEEP_MAX_AMOUNT", "5"))
+MAX_RULES_PER_USER = 50
+DEFAULT_SLIPPAGE = 10
+# Intervalle minimal entre deux vérifications de la version des règles (secondes)
+CHECK_INTERVAL = 1.0
+
+USAGE = (
+    "Auto-sweep buys a rugger's new token as soon as it is created, without waiting for a click.\n\n"
+    "/autosweep set <rugger|all> <amount SOL> [max market cap SOL] [slippage %]\n"
+    "/autosweep remove <rugger|all>\n"
+    "/autosweep off (removes every rule)\n\n"
+    "A rule for a given rugger takes precedence over your `all` rule. "
+    "A max market cap of 0 means no limit."
+)
+
+
+@dataclass(frozen=True)
+class Rule:
+    """One user's auto-sweep rule, for one rugger or for all of them (rugger == ALL_RUGGERS)."""
+    user_id: str
+    rugger: str
+    amount: float
+    max_market_cap: float = 0.0
+    slippage: float = DEFAULT_SLIPPAGE
+
+    def accepts(self, market_cap_sol):
+        return not self.max_market_cap or market_cap_sol <= self.max_market_cap
+
+
+def _init_rules(conn):
+    with conn:
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS rules (
+                user_id TEXT NOT NULL,
+                rugger TEXT NOT NULL,
+                amount REAL NOT NULL,
+                max_market_cap REAL NOT NULL DEFAULT 0,
+                slippage REAL NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (user_id, rugger)
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('rules_version', 0);
+            """
+        )
+
+
+def _rules_db():
+    return get_connection(AUTOSWEEP_DB, _init_rules)
+
+
+def _bump_version(conn):
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'rules_version'")
+
+
+def rules_version():
+    row = _rules_db().execute("SELECT value FROM meta WHERE key = 'rules_version'").fetchone()
+    return row[0] if row else 0
+
+
+def _rule(row):
+    return Rule(row["user_id"], row["rugger"], row["amount"], row["max_market_cap"], row["slippage"])
+
+
+def load_rules():
+    return [_rule(row) for row in _rules_db().execute("SELECT * FROM rules ORDER BY rowid")]
+
+
+def list_rules(user_id):
+    rows = _rules_db().execute("SELECT * FROM rules WHERE user_id = ? ORDER BY rowid", (str(user_id),))
+    return [_rule(row) for row in rows]
+
+
+def set_rule(rule):
+    """Creates or replaces the user's rule for `rule.rugger`."""
+    conn = _rules_db()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO rules (user_id, rugger, amount, max_market_cap, slippage, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, rugger) DO UPDATE SET
+                amount = excluded.amount,
+                max_market_cap = excluded.max_market_cap,
+                slippage = excluded.slippage
+            """,
+            (rule.user_id, rule.rugger, rule.amount, rule.max_market_cap, rule.slippage, time.time()),
+        )
+        _bump_version(conn)
+    rule_index.reload()
+
+
+def remove_rule(user_id, rugger):
+    """Returns True if a rule was removed."""
+    conn = _rules_db()
+    with conn:
+        removed = conn.execute(
+            "DELETE FROM rules WHERE user_id = ? AND rugger = ?", (str(user_id), rugger)
+        ).rowcount
+        _bump_version(conn)
+    rule_index.reload()
+    return removed > 0
+
+
+def clear_rules(user_id):
+    """Removes every rule of the user; returns how many were removed."""
+    conn = _rules_db()
+    with conn:
+        removed = conn.execute("DELETE FROM rules WHERE user_id = ?", (str(user_id),)).rowcount
+        _bump_version(conn)
+    rule_index.reload()
+    return removed
+
+
+class RuleIndex:
+    """
+    In-memory auto-sweep rules, keyed by rugger address.
+
+    `match` never touches the database: it runs in the listener for every
+    rugger create event. The index is rebuilt after each write from this
+    process; writes from other processes are picked up by polling the rules
+    version at most once per `check_interval`.
+    """
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._by_rugger = {}  # rugger -> {user_id: Rule}
+        self._version = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def reload(self):
+        with self._lock:
+            version = rules_version()
+            by_rugger = {}
+            for rule in load_rules():
+                by_rugger.setdefault(rule.rugger, {})[rule.user_id] = rule
+            # Remplacement en un seul bloc : les lectures concurrentes voient l'ancien ou le nouvel index
+            self._by_rugger = by_rugger
+            self._version = version
+
+    def refresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            if rules_version() != self._version:
+                self.reload()
+        except Exception as e:
+            # Base verrouillée ou indisponible : on garde les règles actuelles
+            print(f"Erreur lors du rechargement des règles d'auto-sweep : {e}")
+
+    def match(self, rugger, market_cap_sol):
+        """Rules to run for a create event: at most one per user, specific rules first."""
+        self.refresh()
+        by_rugger = self._by_rugger
+        rules = dict(by_rugger.get(ALL_RUGGERS, {}))
+        rules.update(by_rugger.get(rugger, {}))
+        return [rule for rule in rules.values() if rule.accepts(market_cap_sol)]
+
+    def __len__(self):
+        return sum(len(rules) for rules in self._by_rugger.values())
+
+
+rule_index = RuleIndex()
+
+
+def _format_rule(rule):
+    target = "all ruggers" if rule.rugger == ALL_RUGGERS else f"`{rule.rugger}`"
+    cap = f"≤ {rule.max_market_cap:g} SOL mcap" if rule.max_market_cap else "any mcap"
+    return f"• {target}: buy `{rule.amount:g} SOL`, {cap}, slippage {rule.slippage:g}%"
+
+
+def _parse_set(user_id, args):
+    """Returns (rule, None) or (None, error message) for `/autosweep set` arguments."""
+    if len(args) < 2 or len(args) > 4:
+        return None, "Usage: /autosweep set <rugger|all> <amount SOL> [max market cap SOL] [slippage %]"
+    rugger = ALL_RUGGERS if args[0].lower() == "all" else args[0]
+    if rugger != ALL_RUGGERS:
+        if not is_valid_solana_address(rugger):
+            return None, "Invalid Solana address format."
+        if not address_exists(rugger):
+            return None, "This address is not in the rugger registry."
+    try:
+        amount = float(args[1])
+        max_market_cap = float(args[2]) if len(args) > 2 else 0.0
+        slippage = float(args[3]) if len(args) > 3 else DEFAULT_SLIPPAGE
+    except ValueError:
+        return None, "Amount, market cap and slippage must be numbers."
+    if not 0 < amount <= MAX_AMOUNT:
+        return None, f"Amount must be between 0 and {MAX_AMOUNT:g} SOL."
+    if max_market_cap < 0 or not 0 <= slippage <= 100:
+        return None, "Market cap must be positive and slippage between 0 and 100%."
+    return Rule(user_id, rugger, amount, max_market_cap, slippage), None
+
+
+async def autosweep_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/autosweep: lists, sets or removes the user's auto-sweep rules."""
+    user_id = str(update.effective_user.id)
+    args = context.args or []
+    action = args[0].lower() if args else ""
+
+    if action == "set":
+        if not keystore.has_wallet(user_id):
+            await update.message.reply_text("You need a wallet first: use /wallet.")
+            return
+        rule, error = _parse_set(user_id, args[1:])
+        if error:
+            await update.message.reply_text(error)
+            return
+        existing = {r.rugger for r in list_rules(user_id)}
+        if rule.rugger not in existing and len(existing) >= MAX_RULES_PER_USER:
+            await update.message.reply_text(f"You can have at most {MAX_RULES_PER_USER} auto-sweep rules.")
+            return
+        set_rule(rule)
+        await update.message.reply_text(f"✅ Auto-sweep rule saved:\n{_format_rule(rule)}", parse_mode="Markdown")
+    elif action == "remove" and len(args) == 2:
+        rugger = ALL_RUGGERS if args[1].lower() == "all" else args[1]
+        if remove_rule(user_id, rugger):
+            await update.message.reply_text("Auto-sweep rule removed.")
+        else:
+            await update.message.reply_text("No such auto-sweep rule.")
+    elif action == "off":
+        removed = clear_rules(user_id)
+        await update.message.reply_text(f"Auto-sweep disabled ({removed} rule{'s' if removed != 1 else ''} removed).")
+    else:
+        rules = list_rules(user_id)
+        header = "*🤖 Your auto-sweep rules*\n" + "\n".join(_format_rule(r) for r in rules) if rules else "No auto-sweep rule."
+        await update.message.reply_text(f"{header}\n\n{USAGE}", parse_mode="Markdown")
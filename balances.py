@@ -0,0 +1,46 @@
+import asyncio
+import os
+
+from rpc_pool import rpc_pool
+
+# Limite de clés par appel getMultipleAccounts et nombre d'appels simultanés
+MAX_ACCOUNTS_PER_REQUEST = 100
+MAX_PARALLEL_REQUESTS = int(os.getenv("BALANCE_PARALLEL_REQUESTS", "4"))
+LAMPORTS_PER_SOL = 1_000_000_000
+
+
+async def get_balances(pubkeys, rpc=rpc_pool):
+    """
+    Returns {pubkey: lamports} for every address, using one getMultipleAccounts
+    call per MAX_ACCOUNTS_PER_REQUEST keys. Accounts that do not exist count as 0.
+    """
+    pubkeys = [str(p) for p in pubkeys]
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_REQUESTS)
+    # Seuls les lamports sont utiles : pas de données de compte dans la réponse
+    config = {"encoding": "base64", "dataSlice": {"offset": 0, "length": 0}}
+
+    async def fetch(chunk):
+        async with semaphore:
+            result = await rpc.call("getMultipleAccounts", [chunk, config])
+        return zip(chunk, result["value"])
+
+    chunks = [pubkeys[i:i + MAX_ACCOUNTS_PER_REQUEST] for i in range(0, len(pubkeys), MAX_ACCOUNTS_PER_REQUEST)]
+    balances = {}
+    for results in await asyncio.gather(*(fetch(c) for c in chunks)):
+        for pubkey, account in results:
+            balances[pubkey] = account["lamports"] if account is not None else 0
+    return balances
+
+
+async def custodial_balance_report(wallets, rpc=rpc_pool):
+    """
+    Returns [(telegram_user_id, pubkey, sol)] sorted by balance, for a
+    {telegram_user_id: pubkey} mapping of custodial wallets.
+    """
+    lamports = await get_balances(wallets.values(), rpc)
+    report = [
+        (user_id, pubkey, lamports.get(pubkey, 0) / LAMPORTS_PER_SOL)
+        for user_id, pubkey in wallets.items()
+    ]
+    report.sort(key=lambda row: row[2], reverse=True)
+    return report
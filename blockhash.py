@@ -0,0 +1,67 @@
+import asyncio
+import os
+import time
+
+from solders.hash import Hash
+
+# Intervalle de rafraîchissement du blockhash et âge maximal accepté (secondes)
+REFRESH_INTERVAL = float(os.getenv("BLOCKHASH_REFRESH_INTERVAL", "2"))
+MAX_AGE = float(os.getenv("BLOCKHASH_MAX_AGE", "20"))
+
+
+class BlockhashCache:
+    """
+    Keeps a recent blockhash warm so transactions can be built without an RPC round trip.
+
+    A background task refreshes the value every `refresh_interval` seconds; it is
+    started lazily on first use on the running loop.
+    """
+
+    def __init__(self, rpc, refresh_interval=REFRESH_INTERVAL, max_age=MAX_AGE):
+        self.rpc = rpc
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.blockhash = None
+        self.last_valid_block_height = None
+        self.fetched_at = 0.0
+        self._task = None
+
+    async def refresh(self):
+        value = (await self.rpc.call("getLatestBlockhash", [{"commitment": "confirmed"}]))["value"]
+        self.blockhash = Hash.from_string(value["blockhash"])
+        self.last_valid_block_height = value["lastValidBlockHeight"]
+        self.fetched_at = time.monotonic()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erreur lors du rafraîchissement du blockhash : {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def is_fresh(self):
+        return self.blockhash is not None and time.monotonic() - self.fetched_at < self.max_age
+
+    async def get(self):
+        """Returns (blockhash, last_valid_block_height), fetching inline only if the cache is cold."""
+        self.start()
+        if not self.is_fresh:
+            await self.refresh()
+        return self.blockhash, self.last_valid_block_height
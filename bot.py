@@ -1,16 +1,25 @@
 import logging
 import os
 import asyncio
-import threading
 from dotenv import load_dotenv
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ConversationHandler, CallbackQueryHandler
 
 from handlers import (
-    start, choice_handler, add_rug, add_pumpfun, verify_token_handler,
+    start, choice_handler, add_rug, add_pumpfun, verify_token_handler, rugger_list_callback,
     CHOOSING, ADD_RUG, ADD_PUMPFUN, VERIFY_TOKEN, markup
 )
-from wallet import wallet, wallet_choice_handler, WALLET_MENU
-from pumpportal import fetch_new_tokens, sweep_callback_handler
+from wallet import wallet, wallet_choice_handler, WALLET_MENU, get_encryption_key, keypair_cache, list_wallet_pubkeys, balances_report
+from pumpportal import fetch_new_tokens, sweep_callback_handler, stop_auto_sweeps, stop_alerts
+from autosweep import autosweep_command, rule_index
+from subscriptions import subscribe_command, unsubscribe_command, subscription_index
+from alert_scheduler import alert_scheduler, TelegramRateLimiter
+from http_client import close_clients
+from transactions import blockhash_cache, confirmation_tracker, broadcaster
+import pumpfun
+from token_gate import token_gate
+from rpc_pool import rpc_pool
+import metrics
+from tracing import trace_report
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -20,14 +29,79 @@ logging.basicConfig(
 load_dotenv()
 TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 
-def start_pumpportal_thread():
-    def runner():
-        asyncio.run(fetch_new_tokens())
-    thread = threading.Thread(target=runner, daemon=True)
-    thread.start()
+# "polling" (défaut) ou "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # URL publique annoncée à Telegram (derrière un reverse proxy)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_CERT = os.getenv("WEBHOOK_CERT")  # certificat/clé TLS si le listener sert HTTPS lui-même
+WEBHOOK_KEY = os.getenv("WEBHOOK_KEY")
+# Nombre d'updates traitées en parallèle (1 = séquentiel, comportement historique)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "1"))
+
+async def post_init(application):
+    # Dérive la clé Fernet hors de la boucle avant le premier clic utilisateur
+    try:
+        await asyncio.to_thread(get_encryption_key)
+    except Exception as e:
+        print(f"Impossible de dériver la clé de chiffrement : {e}")
+    rpc_pool.start()
+    if pumpfun.LOCAL_BUILDER_ENABLED:
+        blockhash_cache.start()
+    token_gate.start(list_wallet_pubkeys)
+    # Règles d'auto-sweep et abonnements chargés avant la première alerte
+    await asyncio.to_thread(rule_index.reload)
+    await asyncio.to_thread(subscription_index.reload)
+    alert_scheduler.start(application.bot)
+    try:
+        application.bot_data["metrics_runner"] = await metrics.start_server()
+    except OSError as e:
+        print(f"Impossible d'ouvrir le port des métriques {metrics.METRICS_PORT} : {e}")
+    # Listener PumpPortal dans la boucle du bot : les alertes partagent le client HTTP de application.bot
+    application.bot_data["pumpportal_task"] = asyncio.create_task(fetch_new_tokens(application.bot))
+
+async def post_stop(application):
+    task = application.bot_data.pop("pumpportal_task", None)
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+async def post_shutdown(application):
+    runner = application.bot_data.pop("metrics_runner", None)
+    if runner is not None:
+        await runner.cleanup()
+    await stop_auto_sweeps()
+    await stop_alerts()
+    await alert_scheduler.stop()
+    keypair_cache.clear()
+    await blockhash_cache.stop()
+    await broadcaster.stop()
+    await confirmation_tracker.stop()
+    await rpc_pool.stop()
+    await token_gate.stop()
+    await close_clients()
 
 def main():
-    application = ApplicationBuilder().token(TOKEN).build()
+    if BOT_MODE == "webhook" and not (WEBHOOK_URL or "").startswith("https://"):
+        # Sans URL publique, PTB annoncerait http://127.0.0.1:8443/telegram à Telegram, qui la refuse
+        print("BOT_MODE=webhook : WEBHOOK_URL doit être l'URL https:// publique du bot (ex. https://bot.example.com/telegram).")
+        raise SystemExit(1)
+    application = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .concurrent_updates(CONCURRENT_UPDATES if CONCURRENT_UPDATES > 1 else False)
+        # Tous les messages du bot partagent la limite globale du scheduler de DMs
+        .rate_limiter(TelegramRateLimiter(alert_scheduler))
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
  
     conv_handler = ConversationHandler(
         entry_points=[
@@ -49,9 +123,26 @@ def main():
     )
     application.add_handler(conv_handler)
     application.add_handler(CallbackQueryHandler(sweep_callback_handler, pattern=r"^sweep:"))
+    application.add_handler(CallbackQueryHandler(rugger_list_callback, pattern=r"^ruggers:"))
+    application.add_handler(CommandHandler("balances", balances_report, filters=filters.ChatType.PRIVATE))
+    application.add_handler(CommandHandler("autosweep", autosweep_command, filters=filters.ChatType.PRIVATE))
+    application.add_handler(CommandHandler("subscribe", subscribe_command, filters=filters.ChatType.PRIVATE))
+    application.add_handler(CommandHandler("unsubscribe", unsubscribe_command, filters=filters.ChatType.PRIVATE))
+    application.add_handler(CommandHandler("trace", trace_report, filters=filters.ChatType.PRIVATE))
 
-    start_pumpportal_thread()
-    application.run_polling()
+    if BOT_MODE == "webhook":
+        # Telegram pousse les updates : pas de latence de long-polling sur les callbacks sweep:
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            cert=WEBHOOK_CERT,
+            key=WEBHOOK_KEY,
+        )
+    else:
+        application.run_polling()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
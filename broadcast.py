@@ -0,0 +1,132 @@
+import asyncio
+import base64
+import os
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from http_client import get_client
+from metrics import Counter, Histogram
+
+# Diffusion d'une même transaction signée sur plusieurs RPC (désactivée par défaut)
+BROADCAST_ENABLED = os.getenv("SWEEP_BROADCAST", "0") == "1"
+# Endpoints de diffusion (par défaut ceux du pool RPC)
+BROADCAST_RPC_URLS = os.getenv("BROADCAST_RPC_URLS", "")
+# Rediffusion jusqu'à confirmation, au plus pendant la validité d'un blockhash (secondes)
+REBROADCAST_INTERVAL = float(os.getenv("REBROADCAST_INTERVAL", "2"))
+REBROADCAST_MAX_DURATION = float(os.getenv("REBROADCAST_MAX_DURATION", "90"))
+
+BROADCAST_SENDS = Counter(
+    "broadcast_sends_total", "sendTransaction calls per broadcast endpoint and outcome.", ["endpoint", "kind", "outcome"]
+)
+BROADCAST_ACCEPT_SECONDS = Histogram(
+    "broadcast_accept_duration_seconds", "Time for an endpoint to accept the initial broadcast.", ["endpoint"]
+)
+BROADCAST_FIRST = Counter("broadcast_first_accept_total", "Broadcasts where this endpoint accepted first.", ["endpoint"])
+BROADCAST_LANDED = Counter(
+    "broadcast_landed_total", "Broadcast transactions that confirmed, by first-accepting endpoint.", ["endpoint"]
+)
+
+
+class Broadcaster:
+    """
+    Sends one signed transaction to several RPC endpoints at once.
+
+    The first endpoint that accepts it wins and its signature is returned; if
+    all of them reject it, the first JSON-RPC error is returned instead. The
+    transaction is then re-sent to every endpoint (skipPreflight) every
+    `interval` seconds until the confirmation tracker reports an outcome or
+    REBROADCAST_MAX_DURATION elapses.
+    """
+
+    def __init__(self, urls, tracker, interval=REBROADCAST_INTERVAL, max_duration=REBROADCAST_MAX_DURATION):
+        self.urls = list(urls)
+        self.tracker = tracker
+        self.interval = interval
+        self.max_duration = max_duration
+        self._first = {}  # signature -> libellé de l'endpoint qui a accepté en premier
+        self._tasks = set()
+
+    @staticmethod
+    def label(url):
+        return urlsplit(url).netloc or url
+
+    async def _send_one(self, url, raw, kind, timeout):
+        config = {"encoding": "base64"}
+        if kind == "initial":
+            config["preflightCommitment"] = "confirmed"
+        else:
+            config.update(skipPreflight=True, maxRetries=0)
+        label = self.label(url)
+        start = time.perf_counter()
+        try:
+            response = await get_client().post(
+                url, json={"jsonrpc": "2.0", "id": 1, "method": "sendTransaction", "params": [raw, config]},
+                timeout=timeout,
+            )
+            body = response.json()
+        except (httpx.HTTPError, ValueError):
+            BROADCAST_SENDS.inc(endpoint=label, kind=kind, outcome="error")
+            raise
+        outcome = "accepted" if "result" in body else "rejected"
+        BROADCAST_SENDS.inc(endpoint=label, kind=kind, outcome=outcome)
+        if kind == "initial" and outcome == "accepted":
+            BROADCAST_ACCEPT_SECONDS.observe(time.perf_counter() - start, endpoint=label)
+        return label, body
+
+    async def send(self, tx, timeout=None):
+        """Returns a JSON-RPC response body ({"result": signature} or {"error": ...}) for the hedged send."""
+        raw = base64.b64encode(bytes(tx)).decode()
+        pending = [asyncio.ensure_future(self._send_one(url, raw, "initial", timeout)) for url in self.urls]
+        for future in pending:
+            # Les erreurs des envois encore en vol après le premier succès sont déjà comptées
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        rejection = None
+        failure = None
+        for next_done in asyncio.as_completed(pending):
+            try:
+                label, body = await next_done
+            except (httpx.HTTPError, ValueError) as e:
+                failure = failure or e
+                continue
+            if "result" in body:
+                # Les autres envois continuent en arrière-plan : ils propagent aussi la transaction
+                BROADCAST_FIRST.inc(endpoint=label)
+                self._first[body["result"]] = label
+                self._spawn(self._rebroadcast(body["result"], raw))
+                return body
+            rejection = rejection or body
+        if rejection is not None:
+            return rejection
+        raise failure or RuntimeError("Aucun endpoint de diffusion configuré")
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _rebroadcast(self, signature, raw):
+        outcome = self.tracker.outcome(signature)
+        deadline = time.monotonic() + self.max_duration
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    result = await asyncio.wait_for(asyncio.shield(outcome), self.interval)
+                except asyncio.TimeoutError:
+                    await asyncio.gather(
+                        *(self._send_one(url, raw, "rebroadcast", self.interval) for url in self.urls),
+                        return_exceptions=True,
+                    )
+                    continue
+                if result == "confirmed":
+                    BROADCAST_LANDED.inc(endpoint=self._first.get(signature))
+                return
+        finally:
+            self._first.pop(signature, None)
+            self.tracker.release(signature)
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
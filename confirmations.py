@@ -0,0 +1,176 @@
+import asyncio
+import os
+import time
+
+from telegram.error import TelegramError
+
+from metrics import Counter, Histogram
+
+# Intervalle entre deux passes de getSignatureStatuses (secondes)
+CONFIRM_INTERVAL = float(os.getenv("CONFIRM_INTERVAL", "1"))
+# Niveau attendu avant d'annoncer le résultat : "confirmed" ou "finalized"
+CONFIRM_COMMITMENT = os.getenv("CONFIRM_COMMITMENT", "confirmed")
+# Limite de signatures par appel getSignatureStatuses
+MAX_SIGNATURES_PER_REQUEST = 256
+# Abandon du suivi si le RPC ne répond plus (le blockhash expire bien avant)
+TRACK_TIMEOUT = 180
+TIMEOUT_LINE = "⌛ Confirmation status unknown, check the Solscan link."
+
+CONFIRMATIONS = Counter("sweep_confirmations_total", "Tracked sweep transactions by final outcome.", ["outcome"])
+CONFIRM_SECONDS = Histogram(
+    "sweep_confirmation_duration_seconds", "Time from submission to the final outcome of a sweep.", ["outcome"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 90, 120, 180),
+)
+
+_COMMITMENT_RANK = {"processed": 0, "confirmed": 1, "finalized": 2}
+
+
+def describe_error(err):
+    """Short human-readable form of a transaction error from getSignatureStatuses."""
+    if isinstance(err, dict) and "InstructionError" in err:
+        index, detail = err["InstructionError"]
+        if isinstance(detail, dict):
+            detail = ", ".join(f"{k}({v})" for k, v in detail.items())
+        return f"instruction {index} failed: {detail}"
+    if isinstance(err, dict):
+        return ", ".join(f"{k}({v})" for k, v in err.items())
+    return str(err)
+
+
+class _Pending:
+    __slots__ = ("bot", "chat_id", "message_id", "text", "blockhash", "submitted_at", "blockhash_expired")
+
+    def __init__(self, bot, chat_id, message_id, text, blockhash):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.text = text
+        self.blockhash = blockhash
+        self.submitted_at = time.monotonic()
+        self.blockhash_expired = False
+
+
+class ConfirmationTracker:
+    """
+    Follows submitted signatures until they reach CONFIRM_COMMITMENT, fail
+    on-chain or expire, then edits the user's message with the outcome.
+
+    Every CONFIRM_INTERVAL seconds all in-flight signatures are checked with
+    batched getSignatureStatuses calls. A signature still unknown once its
+    blockhash is no longer valid (isBlockhashValid) is reported as expired.
+    """
+
+    def __init__(self, rpc, interval=CONFIRM_INTERVAL, commitment=CONFIRM_COMMITMENT):
+        self.rpc = rpc
+        self.interval = interval
+        self.commitment = commitment
+        self._pending = {}
+        self._outcomes = {}
+        self._task = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def track(self, bot, signature, chat_id, message_id, text, blockhash=None):
+        """Starts following `signature`; `text` is the message body to complete with the outcome."""
+        self._pending[signature] = _Pending(bot, chat_id, message_id, text, blockhash)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def outcome(self, signature):
+        """Future resolved with the final outcome ("confirmed", "failed", "expired"...) of `signature`."""
+        future = self._outcomes.get(signature)
+        if future is None:
+            future = self._outcomes[signature] = asyncio.get_running_loop().create_future()
+        return future
+
+    def release(self, signature):
+        """Drops the outcome future of `signature` (for signatures that were never tracked)."""
+        self._outcomes.pop(signature, None)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _rpc(self, method, params):
+        return (await self.rpc.call(method, params))["value"]
+
+    async def _statuses(self, signatures):
+        chunks = [signatures[i:i + MAX_SIGNATURES_PER_REQUEST] for i in range(0, len(signatures), MAX_SIGNATURES_PER_REQUEST)]
+        results = await asyncio.gather(*(self._rpc("getSignatureStatuses", [chunk]) for chunk in chunks))
+        return dict(zip(signatures, (status for values in results for status in values)))
+
+    async def _expired_blockhashes(self, blockhashes):
+        blockhashes = list(blockhashes)
+        valid = await asyncio.gather(
+            *(self._rpc("isBlockhashValid", [b, {"commitment": "processed"}]) for b in blockhashes)
+        )
+        return {b for b, ok in zip(blockhashes, valid) if not ok}
+
+    async def poll(self):
+        """One pass over every in-flight signature."""
+        signatures = list(self._pending)
+        try:
+            statuses = await self._statuses(signatures)
+        except Exception:
+            # RPC en échec : les signatures trop anciennes se terminent quand même, sinon _pending ne se vide jamais
+            now = time.monotonic()
+            await asyncio.gather(*(
+                self._finish(signature, "timeout", TIMEOUT_LINE)
+                for signature in signatures if now - self._pending[signature].submitted_at > TRACK_TIMEOUT
+            ))
+            raise
+        unknown = []
+        finished = []
+        for signature in signatures:
+            status = statuses.get(signature)
+            entry = self._pending[signature]
+            if status is not None and status.get("err") is not None:
+                finished.append((signature, "failed", f"❌ Transaction failed on-chain: {describe_error(status['err'])}"))
+            elif status is not None and _COMMITMENT_RANK.get(status.get("confirmationStatus"), 0) >= _COMMITMENT_RANK[self.commitment]:
+                finished.append((signature, "confirmed", f"✅ Transaction {status['confirmationStatus']} (slot {status['slot']})"))
+            elif status is None and entry.blockhash_expired:
+                # Blockhash déjà expiré au tour précédent et toujours inconnue : ne passera plus
+                finished.append((signature, "expired", "⌛ Transaction expired: not landed before its blockhash expired."))
+            elif time.monotonic() - entry.submitted_at > TRACK_TIMEOUT:
+                finished.append((signature, "timeout", TIMEOUT_LINE))
+            elif status is None and entry.blockhash:
+                unknown.append(entry)
+        # Les éditions Telegram partent en parallèle
+        await asyncio.gather(*(self._finish(*f) for f in finished))
+        if unknown:
+            expired = await self._expired_blockhashes({e.blockhash for e in unknown})
+            for entry in unknown:
+                entry.blockhash_expired = entry.blockhash in expired
+
+    async def _finish(self, signature, outcome, line):
+        entry = self._pending.pop(signature)
+        future = self._outcomes.pop(signature, None)
+        if future is not None and not future.done():
+            future.set_result(outcome)
+        CONFIRMATIONS.inc(outcome=outcome)
+        CONFIRM_SECONDS.observe(time.monotonic() - entry.submitted_at, outcome=outcome)
+        try:
+            await entry.bot.edit_message_text(
+                chat_id=entry.chat_id,
+                message_id=entry.message_id,
+                text=f"{entry.text}\n\n{line}",
+                parse_mode="Markdown",
+            )
+        except TelegramError as e:
+            print(f"Impossible de mettre à jour le message de la transaction {signature} : {e}")
+
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erreur lors du suivi des confirmations : {e}")
@@ -0,0 +1,40 @@
+import json
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:  # orjson est optionnel, json standard sinon
+    loads = json.loads
+
+TRADER_FIELD = b'"traderPublicKey"'
+_SKIP = b" \t\r\n:"
+
+
+def extract_trader(frame):
+    """
+    Returns the traderPublicKey of a raw PumpPortal frame without decoding the
+    JSON, or None if the field is absent. Accepts bytes or str frames.
+    """
+    if isinstance(frame, str):
+        frame = frame.encode()
+    i = frame.find(TRADER_FIELD)
+    if i < 0:
+        return None
+    i += len(TRADER_FIELD)
+    n = len(frame)
+    while i < n and frame[i] in _SKIP:
+        i += 1
+    if i >= n or frame[i] != 0x22:  # '"'
+        return None
+    end = frame.find(b'"', i + 1)
+    if end < 0:
+        return None
+    return frame[i + 1:end].decode("ascii", "replace")
+
+
+def decode_if_match(frame, index):
+    """Fully decodes the frame only if its trader is in `index`; returns None otherwise."""
+    trader = extract_trader(frame)
+    if trader is None or trader not in index:
+        return None
+    return loads(frame)
@@ -1,10 +1,11 @@
 import re
-from telegram import ReplyKeyboardMarkup
+from telegram import ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
 from utils import (
-    load_addresses, save_address, is_valid_solana_address, address_exists
+    load_addresses, save_address, is_valid_solana_address, address_exists,
+    get_address, count_addresses, list_addresses_page, registry_version, RUGGER_ORDERS
 )
 
 CHOOSING, ADD_RUG, ADD_PUMPFUN, VERIFY_TOKEN = range(4)
@@ -14,9 +15,19 @@ reply_keyboard = [
 ]
 markup = ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True, resize_keyboard=True)
 
+# Liste des ruggers : 20 entrées par page tiennent sous la limite de 4096 caractères de Telegram
+RUGGERS_PAGE_SIZE = 20
+RUGGERS_PAGE_CACHE_SIZE = 256
+ORDER_LABELS = {"count": "most reported", "recent": "most recent"}
+
+# (order, page, after, before) -> (text, keyboard), vidé dès que le registre change
+_page_cache = {}
+_page_cache_version = None
+# Nombre d'entrées du registre à cette version (COUNT(*) parcourt toute la table)
+_page_cache_total = None
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    addresses = load_addresses()
-    count = len(addresses)
+    count = count_addresses()
     await update.message.reply_photo(
         photo="https://pbs.twimg.com/media/GzCWA2sWMAALOeZ?format=jpg&name=medium"
     )
@@ -35,10 +46,8 @@ async def add_rug(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ADD_RUG
 
     if address_exists(address):
-        # Incrémente le compteur dans le JSON
-        save_address(address)
-        data = load_addresses()
-        count = data[address]["count"]
+        # Incrémente le compteur dans le registre
+        count = save_address(address)
         await update.message.reply_text(
             f"Rugger address already exists. Counter incremented.\nThis address has been reported {count} time{'s' if count > 1 else ''}."
         )
@@ -59,9 +68,7 @@ async def add_pumpfun(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ADD_PUMPFUN
 
     address = context.user_data.get("rug_address", "")
-    save_address(address, pumpfun_link)
-    data = load_addresses()
-    count = data[address]["count"]
+    count = save_address(address, pumpfun_link)
     await update.message.reply_text(
         f"Rug address added: {address}\nPump.fun link: {pumpfun_link}\nThis entry has been added {count} time{'s' if count > 1 else ''}."
     )
@@ -69,20 +76,98 @@ async def add_pumpfun(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("What would you like to do?", reply_markup=markup)
     return CHOOSING
 
+def render_rugger_page(order="count", page=0, after=None, before=None):
+    """
+    Returns (text, keyboard) for one page of the rugger list, or (None, None)
+    if the registry is empty. `after`/`before` are the keyset cursors carried
+    by the Prev/Next buttons; `page` is only used for numbering.
+    """
+    global _page_cache_version, _page_cache_total
+    version = registry_version()
+    if version != _page_cache_version:
+        _page_cache.clear()
+        _page_cache_version = version
+        _page_cache_total = count_addresses()
+    cache_key = (order, page, after, before)
+    cached = _page_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    total = _page_cache_total
+    if total == 0:
+        return None, None
+    pages = (total + RUGGERS_PAGE_SIZE - 1) // RUGGERS_PAGE_SIZE
+    rows = list_addresses_page(order, after, before, RUGGERS_PAGE_SIZE)
+    if not rows or page >= pages:
+        # Curseur périmé (registre modifié depuis) : retour à la première page
+        page = 0
+        rows = list_addresses_page(order, limit=RUGGERS_PAGE_SIZE)
+    offset = page * RUGGERS_PAGE_SIZE
+    lines = [f"*🧹 Ruggers list* ({total}, {ORDER_LABELS[order]})\n"]
+    for idx, (rug_address, pumpfun_link, count, _) in enumerate(rows, offset + 1):
+        lines.append(f"{idx}. [{rug_address}]({pumpfun_link}) — ({count} report{'s' if count > 1 else ''})")
+    text = "\n".join(lines)
+
+    # Les boutons portent la clé (valeur, rowid) de la première/dernière ligne de la page
+    first, last = rows[0][3], rows[-1][3]
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀️ Prev", callback_data=f"ruggers:{order}:{page - 1}:b:{first[0]}:{first[1]}"))
+    nav.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data="ruggers:noop"))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton("Next ▶️", callback_data=f"ruggers:{order}:{page + 1}:a:{last[0]}:{last[1]}"))
+    other = "recent" if order == "count" else "count"
+    keyboard = InlineKeyboardMarkup([
+        nav,
+        [InlineKeyboardButton(f"Sort by {ORDER_LABELS[other]}", callback_data=f"ruggers:{other}:0")],
+    ])
+
+    if len(_page_cache) >= RUGGERS_PAGE_CACHE_SIZE:
+        _page_cache.pop(next(iter(_page_cache)))
+    _page_cache[cache_key] = (text, keyboard)
+    return text, keyboard
+
+def _parse_rugger_callback(data):
+    """Returns (order, page, after, before) from ruggers:<order>:<page>[:a|b:<value>:<rowid>] callback data."""
+    parts = data.split(":")
+    order = parts[1]
+    if order not in RUGGER_ORDERS:
+        raise ValueError(f"unknown order {order}")
+    page = int(parts[2])
+    if len(parts) == 3:
+        return order, page, None, None
+    direction, key = parts[3], (float(parts[4]), int(parts[5]))
+    if direction == "a":
+        return order, page, key, None
+    if direction == "b":
+        return order, page, None, key
+    raise ValueError(f"unknown direction {direction}")
+
+async def rugger_list_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    if query.data == "ruggers:noop":
+        return
+    try:
+        order, page, after, before = _parse_rugger_callback(query.data)
+    except (ValueError, IndexError):
+        # Bouton périmé ou données invalides : première page
+        order, page, after, before = "count", 0, None, None
+    text, keyboard = render_rugger_page(order, page, after, before)
+    if text is None:
+        await query.edit_message_text("No rug address registered.")
+        return
+    await query.edit_message_text(text, parse_mode="Markdown", reply_markup=keyboard, disable_web_page_preview=True)
+
 async def choice_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text
     if text == "Add a rug address":
         await update.message.reply_text("Please send the rug address to add:")
         return ADD_RUG
     elif text == "Show address list":
-        data = load_addresses()
-        if data:
-            msg = "*🧹 Ruggers list*\n\n"
-            for idx, (rug_address, info) in enumerate(data.items(), 1):
-                pumpfun_link = info.get("pumpfun_link", "")
-                count = info.get("count", 1)
-                msg += f"{idx}. [{rug_address}]({pumpfun_link}) — ({count} report{'s' if count > 1 else ''})\n"
-            await update.message.reply_text(msg, parse_mode="Markdown")
+        text, keyboard = render_rugger_page()
+        if text is not None:
+            await update.message.reply_text(text, parse_mode="Markdown", reply_markup=keyboard, disable_web_page_preview=True)
         else:
             await update.message.reply_text("No rug address registered.")
         return CHOOSING
@@ -103,9 +188,9 @@ async def verify_token_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             "Invalid Solana address format.\nPlease send a valid Solana address (32-44 base58 characters)."
         )
         return VERIFY_TOKEN
-    data = load_addresses()
-    if address in data:
-        pumpfun_link = data[address].get("pumpfun_link", "")
+    entry = get_address(address)
+    if entry is not None:
+        pumpfun_link = entry.get("pumpfun_link", "")
         msg = f"⚠️ Danger ! rugger is on list.\nPumpfun link: {pumpfun_link}" if pumpfun_link else "⚠️ Danger ! rugger is on list."
         await update.message.reply_text(msg)
     else:
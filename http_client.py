@@ -0,0 +1,49 @@
+import asyncio
+import httpx
+
+from metrics import InstrumentedTransport
+
+try:
+    import h2  # noqa: F401  (active HTTP/2 dans httpx si installé)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=60.0,
+)
+
+# Un client par boucle asyncio : les connexions httpx ne peuvent pas être
+# partagées entre boucles (outils autonomes lancés avec asyncio.run).
+_http_clients = {}
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide async HTTP client for the running event loop.
+
+    httpx keeps a keep-alive connection pool per host, so Telegram, PumpPortal,
+    Helius and CoinGecko calls all reuse warm TCP/TLS connections. Request
+    latency is recorded per host in the metrics.
+    """
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            transport=InstrumentedTransport(
+                httpx.AsyncHTTPTransport(http2=HTTP2_AVAILABLE, limits=DEFAULT_LIMITS)
+            ),
+        )
+        _http_clients[loop] = client
+    return client
+
+
+async def close_clients():
+    """Closes the client bound to the running loop (to call on shutdown)."""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,65 @@
+import time
+import threading
+from collections import OrderedDict
+from solders.keypair import Keypair
+
+DEFAULT_MAXSIZE = 1024
+DEFAULT_TTL = 600  # secondes
+
+
+class KeypairCache:
+    """
+    Bounded LRU cache of decrypted keypairs, keyed by Telegram user id.
+
+    Entries expire `ttl` seconds after they were stored. Secrets are kept in a
+    bytearray that is overwritten with zeros when the entry is evicted,
+    expired or invalidated; callers get a fresh `Keypair` built from it.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (expires_at, pubkey, secret)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _wipe(entry):
+        secret = entry[2]
+        secret[:] = bytes(len(secret))
+
+    def get(self, user_id):
+        """Returns (pubkey, Keypair) or None if absent or expired."""
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._wipe(self._entries.pop(user_id))
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1], Keypair.from_bytes(bytes(entry[2]))
+
+    def put(self, user_id, keypair: Keypair):
+        user_id = str(user_id)
+        entry = (time.monotonic() + self.ttl, str(keypair.pubkey()), bytearray(bytes(keypair)))
+        with self._lock:
+            old = self._entries.pop(user_id, None)
+            if old is not None:
+                self._wipe(old)
+            self._entries[user_id] = entry
+            while len(self._entries) > self.maxsize:
+                _, evicted = self._entries.popitem(last=False)
+                self._wipe(evicted)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            entry = self._entries.pop(str(user_id), None)
+            if entry is not None:
+                self._wipe(entry)
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries.values():
+                self._wipe(entry)
+            self._entries.clear()
@@ -0,0 +1,102 @@
+import os
+import json
+import time
+
+from storage import get_connection
+
+# Ancien fichier de clés, migré une seule fois vers SQLite
+LEGACY_KEYS_FILE = "data/encrypted_keys.json"
+KEYS_DB = os.getenv("KEYS_DB", "data/keys.db")
+
+
+def _migrate_json(conn):
+    """Imports data/encrypted_keys.json (public keys are filled in lazily on first use)."""
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+        return
+    if os.path.exists(LEGACY_KEYS_FILE):
+        with open(LEGACY_KEYS_FILE, "r") as f:
+            data = json.load(f)
+        now = time.time()
+        conn.executemany(
+            "INSERT OR IGNORE INTO wallets (user_id, pubkey, encrypted_privkey, created_at) VALUES (?, NULL, ?, ?)",
+            [(str(user_id), encrypted_privkey, now) for user_id, encrypted_privkey in data.items()],
+        )
+        print(f"Clés migrées depuis {LEGACY_KEYS_FILE} : {len(data)} wallets")
+    conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', 1)")
+
+
+def _init_keystore(conn):
+    with conn:
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS wallets (
+                user_id TEXT PRIMARY KEY,
+                pubkey TEXT,
+                encrypted_privkey TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS wallets_by_pubkey ON wallets (pubkey);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """
+        )
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _migrate_json(conn)
+
+
+def _keystore():
+    return get_connection(KEYS_DB, _init_keystore)
+
+
+def get_encrypted_key(user_id):
+    row = _keystore().execute(
+        "SELECT encrypted_privkey FROM wallets WHERE user_id = ?", (str(user_id),)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def get_pubkey(user_id):
+    """Public address of the user's wallet, without decrypting anything (None if unknown)."""
+    row = _keystore().execute("SELECT pubkey FROM wallets WHERE user_id = ?", (str(user_id),)).fetchone()
+    return row[0] if row else None
+
+
+def has_wallet(user_id):
+    return _keystore().execute("SELECT 1 FROM wallets WHERE user_id = ?", (str(user_id),)).fetchone() is not None
+
+
+def put(user_id, encrypted_privkey, pubkey=None):
+    """Creates or replaces one wallet record in a single transaction."""
+    conn = _keystore()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO wallets (user_id, pubkey, encrypted_privkey, created_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                pubkey = excluded.pubkey,
+                encrypted_privkey = excluded.encrypted_privkey
+            """,
+            (str(user_id), pubkey, encrypted_privkey, time.time()),
+        )
+
+
+def create(user_id, encrypted_privkey, pubkey):
+    """Stores a new wallet; returns False if the user already has one."""
+    conn = _keystore()
+    with conn:
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO wallets (user_id, pubkey, encrypted_privkey, created_at) VALUES (?, ?, ?, ?)",
+            (str(user_id), pubkey, encrypted_privkey, time.time()),
+        )
+    return cursor.rowcount == 1
+
+
+def set_pubkey(user_id, pubkey):
+    conn = _keystore()
+    with conn:
+        conn.execute("UPDATE wallets SET pubkey = ? WHERE user_id = ?", (pubkey, str(user_id)))
+
+
+def list_pubkeys():
+    """Returns {user_id: pubkey}; pubkey is None for migrated records not yet resolved."""
+    return {row[0]: row[1] for row in _keystore().execute("SELECT user_id, pubkey FROM wallets")}
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import time
+
+from http_client import get_client
+
+# Durée pendant laquelle un prix est considéré frais (secondes)
+SOL_PRICE_TTL = float(os.getenv("SOL_PRICE_TTL", "30"))
+SOURCE_TIMEOUT = 5
+
+
+async def coingecko_sol_usd():
+    resp = await get_client().get(
+        "https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd",
+        timeout=SOURCE_TIMEOUT,
+    )
+    resp.raise_for_status()
+    return float(resp.json()["solana"]["usd"])
+
+
+async def coinbase_sol_usd():
+    resp = await get_client().get("https://api.coinbase.com/v2/prices/SOL-USD/spot", timeout=SOURCE_TIMEOUT)
+    resp.raise_for_status()
+    return float(resp.json()["data"]["amount"])
+
+
+class PriceCache:
+    """
+    Single-flight TTL cache for one price.
+
+    Concurrent callers share a single in-flight fetch. Sources are tried in
+    order until one answers; if all fail, the last good value is served even
+    when stale. Prices seen elsewhere can be pushed in with `record`.
+    """
+
+    def __init__(self, sources, ttl=SOL_PRICE_TTL):
+        self.sources = list(sources)
+        self.ttl = ttl
+        self.value = None
+        self.source = None
+        self.updated_at = 0.0
+        self._inflight = None
+
+    def add_source(self, name, fetch):
+        self.sources.append((name, fetch))
+
+    def record(self, price, source="observed"):
+        """Stores a price obtained outside of the configured sources."""
+        self.value = float(price)
+        self.source = source
+        self.updated_at = time.monotonic()
+
+    @property
+    def is_fresh(self):
+        return self.value is not None and time.monotonic() - self.updated_at < self.ttl
+
+    async def _fetch(self):
+        try:
+            for name, fetch in self.sources:
+                try:
+                    self.record(await fetch(), name)
+                    return self.value
+                except Exception as e:
+                    print(f"Erreur lors de la récupération du prix via {name} : {e}")
+            return self.value  # dernier prix connu, éventuellement périmé
+        finally:
+            self._inflight = None
+
+    async def get(self):
+        """Returns the cached price, refreshing it (once for all callers) when stale."""
+        if self.is_fresh:
+            return self.value
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+        return await asyncio.shield(self._inflight)
+
+
+sol_price = PriceCache([
+    ("coingecko", coingecko_sol_usd),
+    ("coinbase", coinbase_sol_usd),
+])
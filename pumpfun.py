@@ -0,0 +1,191 @@
+import os
+import base64
+import struct
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from solders.pubkey import Pubkey
+from solders.keypair import Keypair
+from solders.instruction import Instruction, AccountMeta
+from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price
+from solders.message import MessageV0
+from solders.transaction import VersionedTransaction
+
+from rpc_pool import rpc_pool
+
+# Active le builder local (sinon toutes les transactions passent par trade-local)
+LOCAL_BUILDER_ENABLED = os.getenv("PUMPFUN_LOCAL_BUILDER", "0") == "1"
+
+PUMP_PROGRAM = Pubkey.from_string("6EF8rrecthR5Dkzon8Nwu78hRvfCKubJ14M5uBEwF6P")
+PUMP_GLOBAL = Pubkey.from_string("4wTV1YmiEkRvAtNtsSGPtUrqRYQMe5SKy2uB4Jjaxnjf")
+PUMP_FEE_RECIPIENT = Pubkey.from_string("CebN5WGQ4jvEPvsVU4EoHEpgzq1VV7AbicfhtW4xC9iM")
+PUMP_EVENT_AUTHORITY = Pubkey.from_string("Ce6TQqeHC9p8KetsN6JsjHK7UTZk7nasjjnr7XxXp9F1")
+PUMP_FEE_PROGRAM = Pubkey.from_string("pfeeUxB6jkeY1Hxd7CsFCAjcbHA9rWtchMGdZ6VojVZ")
+SYSTEM_PROGRAM = Pubkey.from_string("11111111111111111111111111111111")
+TOKEN_PROGRAM = Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
+ASSOCIATED_TOKEN_PROGRAM = Pubkey.from_string("ATokenGPvbdGVxr1b2hvZbsiqW5xWH25efTNsLJA8knL")
+
+BUY_DISCRIMINATOR = bytes([102, 6, 61, 18, 1, 218, 235, 234])
+TOKEN_DECIMALS = 6
+LAMPORTS_PER_SOL = 1_000_000_000
+
+COMPUTE_UNIT_LIMIT = int(os.getenv("PUMPFUN_COMPUTE_UNIT_LIMIT", "120000"))
+# Frais de trading pump.fun (protocole + créateur) en points de base
+FEE_BPS = int(os.getenv("PUMPFUN_FEE_BPS", "125"))
+# Âge maximal d'un état de bonding curve observé dans le flux (secondes)
+CURVE_STATE_TTL = float(os.getenv("PUMPFUN_CURVE_STATE_TTL", "5"))
+
+
+@dataclass
+class CurveState:
+    virtual_token_reserves: int
+    virtual_sol_reserves: int
+    creator: Pubkey
+    complete: bool = False
+    observed_at: float = 0.0
+
+
+# mint -> CurveState, alimenté par les événements "create" du flux PumpPortal
+_curve_states = {}
+
+
+def bonding_curve_address(mint: Pubkey) -> Pubkey:
+    return Pubkey.find_program_address([b"bonding-curve", bytes(mint)], PUMP_PROGRAM)[0]
+
+
+def associated_token_address(owner: Pubkey, mint: Pubkey, token_program: Pubkey = TOKEN_PROGRAM) -> Pubkey:
+    return Pubkey.find_program_address(
+        [bytes(owner), bytes(token_program), bytes(mint)], ASSOCIATED_TOKEN_PROGRAM
+    )[0]
+
+
+def creator_vault_address(creator: Pubkey) -> Pubkey:
+    return Pubkey.find_program_address([b"creator-vault", bytes(creator)], PUMP_PROGRAM)[0]
+
+
+def global_volume_accumulator_address() -> Pubkey:
+    return Pubkey.find_program_address([b"global_volume_accumulator"], PUMP_PROGRAM)[0]
+
+
+def user_volume_accumulator_address(user: Pubkey) -> Pubkey:
+    return Pubkey.find_program_address([b"user_volume_accumulator", bytes(user)], PUMP_PROGRAM)[0]
+
+
+def fee_config_address() -> Pubkey:
+    return Pubkey.find_program_address([b"fee_config", bytes(PUMP_PROGRAM)], PUMP_FEE_PROGRAM)[0]
+
+
+def remember_curve_state(event: dict):
+    """Caches the bonding-curve reserves and creator reported by a PumpPortal create event."""
+    try:
+        _curve_states[event["mint"]] = CurveState(
+            virtual_token_reserves=round(float(event["vTokensInBondingCurve"]) * 10 ** TOKEN_DECIMALS),
+            virtual_sol_reserves=round(float(event["vSolInBondingCurve"]) * LAMPORTS_PER_SOL),
+            creator=Pubkey.from_string(event["traderPublicKey"]),
+            observed_at=time.monotonic(),
+        )
+    except (KeyError, ValueError, TypeError):
+        pass
+
+
+def cached_curve_state(mint: str) -> Optional[CurveState]:
+    state = _curve_states.get(mint)
+    if state is None or time.monotonic() - state.observed_at > CURVE_STATE_TTL:
+        return None
+    return state
+
+
+def decode_curve_state(data: bytes) -> CurveState:
+    """Decodes a BondingCurve account (8-byte discriminator, five u64, bool, creator)."""
+    virtual_token, virtual_sol, _real_token, _real_sol, _supply = struct.unpack_from("<5Q", data, 8)
+    complete = bool(data[48])
+    creator = Pubkey.from_bytes(data[49:81])
+    return CurveState(virtual_token, virtual_sol, creator, complete, time.monotonic())
+
+
+async def fetch_curve_account(mint: str, rpc=rpc_pool) -> Optional[bytes]:
+    """Raw bonding-curve account data, or None if the account does not exist."""
+    address = str(bonding_curve_address(Pubkey.from_string(mint)))
+    account = (await rpc.call("getAccountInfo", [address, {"encoding": "base64"}]))["value"]
+    return None if account is None else base64.b64decode(account["data"][0])
+
+
+async def fetch_curve_state(mint: str, rpc=rpc_pool) -> Optional[CurveState]:
+    """Reads the bonding-curve account over RPC (used by tools and when no cached state exists)."""
+    data = await fetch_curve_account(mint, rpc)
+    return None if data is None else decode_curve_state(data)
+
+
+def quote_buy(state: CurveState, sol_lamports: int, slippage: float):
+    """Returns (token_amount, max_sol_cost) for spending `sol_lamports` on the curve."""
+    sol_after_fee = sol_lamports * 10_000 // (10_000 + FEE_BPS)
+    token_amount = state.virtual_token_reserves * sol_after_fee // (state.virtual_sol_reserves + sol_after_fee)
+    max_sol_cost = int(sol_lamports * (100 + slippage) // 100)
+    return token_amount, max_sol_cost
+
+
+def buy_instructions(user: Pubkey, mint: Pubkey, state: CurveState, token_amount: int,
+                     max_sol_cost: int, priority_fee_sol: float):
+    """Compute-budget, idempotent ATA creation and pump.fun `buy` instructions."""
+    bonding_curve = bonding_curve_address(mint)
+    associated_user = associated_token_address(user, mint)
+
+    micro_lamports = int(priority_fee_sol * LAMPORTS_PER_SOL * 1_000_000 // COMPUTE_UNIT_LIMIT)
+    create_ata = Instruction(
+        ASSOCIATED_TOKEN_PROGRAM,
+        bytes([1]),  # CreateIdempotent
+        [
+            AccountMeta(user, True, True),
+            AccountMeta(associated_user, False, True),
+            AccountMeta(user, False, False),
+            AccountMeta(mint, False, False),
+            AccountMeta(SYSTEM_PROGRAM, False, False),
+            AccountMeta(TOKEN_PROGRAM, False, False),
+        ],
+    )
+    buy = Instruction(
+        PUMP_PROGRAM,
+        BUY_DISCRIMINATOR + struct.pack("<QQ", token_amount, max_sol_cost),
+        [
+            AccountMeta(PUMP_GLOBAL, False, False),
+            AccountMeta(PUMP_FEE_RECIPIENT, False, True),
+            AccountMeta(mint, False, False),
+            AccountMeta(bonding_curve, False, True),
+            AccountMeta(associated_token_address(bonding_curve, mint), False, True),
+            AccountMeta(associated_user, False, True),
+            AccountMeta(user, True, True),
+            AccountMeta(SYSTEM_PROGRAM, False, False),
+            AccountMeta(TOKEN_PROGRAM, False, False),
+            AccountMeta(creator_vault_address(state.creator), False, True),
+            AccountMeta(PUMP_EVENT_AUTHORITY, False, False),
+            AccountMeta(PUMP_PROGRAM, False, False),
+            AccountMeta(global_volume_accumulator_address(), False, True),
+            AccountMeta(user_volume_accumulator_address(user), False, True),
+            AccountMeta(fee_config_address(), False, False),
+            AccountMeta(PUMP_FEE_PROGRAM, False, False),
+        ],
+    )
+    return [
+        set_compute_unit_limit(COMPUTE_UNIT_LIMIT),
+        set_compute_unit_price(micro_lamports),
+        create_ata,
+        buy,
+    ]
+
+
+def buy_message(user: Pubkey, mint: str, state: CurveState, amount_sol: float,
+                slippage: float, priority_fee_sol: float, blockhash) -> MessageV0:
+    """Compiles the unsigned buy message, comparable byte for byte with a trade-local response."""
+    token_amount, max_sol_cost = quote_buy(state, int(float(amount_sol) * LAMPORTS_PER_SOL), slippage)
+    instructions = buy_instructions(
+        user, Pubkey.from_string(mint), state, token_amount, max_sol_cost, priority_fee_sol
+    )
+    return MessageV0.try_compile(user, instructions, [], blockhash)
+
+
+def build_buy_transaction(keypair: Keypair, mint: str, state: CurveState, amount_sol: float,
+                          slippage: float, priority_fee_sol: float, blockhash) -> VersionedTransaction:
+    """Builds and signs a pump.fun bonding-curve buy without calling PumpPortal."""
+    message = buy_message(keypair.pubkey(), mint, state, amount_sol, slippage, priority_fee_sol, blockhash)
+    return VersionedTransaction(message, [keypair])
@@ -2,16 +2,69 @@ import asyncio
 import websockets
 import json
 import os
-import requests
+import random
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
-from telegram import InlineKeyboardMarkup, InlineKeyboardButton 
-from transactions import buy_token
+from telegram import Bot, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram.error import TelegramError
+from telegram.ext import ExtBot
+from transactions import buy_token, confirmation_tracker, ERR_INSUFFICIENT_LAMPORTS, SWEEP_STAGE_SECONDS
+from http_client import get_client
+from metrics import Counter, Gauge, Histogram
+import tracing
 import wallet
-from solders.keypair import Keypair
+import pumpfun
+import firehose
+from rugger_index import rugger_index
+from token_gate import token_gate
+from autosweep import rule_index
+from subscriptions import subscription_index
+from alert_scheduler import alert_scheduler, TelegramRateLimiter
 
 load_dotenv()
 
-def send_telegram_message(
+PUMPPORTAL_WS_URI = os.getenv("PUMPPORTAL_WS_URI", "wss://pumpportal.fun/api/data")
+# Reconnexion : backoff exponentiel (secondes), remis à zéro après une connexion stable
+RECONNECT_BASE_DELAY = 0.25
+RECONNECT_MAX_DELAY = 30
+STABLE_CONNECTION = 30
+# Détection des connexions bloquées : ping websocket et silence maximal du flux
+PING_INTERVAL = 10
+PING_TIMEOUT = 10
+IDLE_TIMEOUT = float(os.getenv("PUMPPORTAL_IDLE_TIMEOUT", "60"))
+# Nombre de signatures mémorisées pour ignorer les événements rejoués
+DEDUPE_SIZE = 10_000
+# "firehose" : tous les tokens créés ; "accounts" : uniquement les comptes des ruggers
+PUMPPORTAL_MODE = os.getenv("PUMPPORTAL_MODE", "firehose")
+ACCOUNT_KEYS_PER_CONNECTION = int(os.getenv("PUMPPORTAL_KEYS_PER_CONNECTION", "500"))
+ACCOUNT_INDEX_POLL = 1.0
+# Achats auto-sweep lancés en parallèle au plus (les suivants attendent leur tour)
+AUTO_SWEEP_CONCURRENCY = int(os.getenv("AUTO_SWEEP_CONCURRENCY", "32"))
+# Un achat auto-sweep encore en file après ce délai depuis la détection est abandonné (secondes) :
+# le market cap a pu dépasser le plafond de la règle depuis
+AUTO_SWEEP_MAX_DELAY = float(os.getenv("AUTO_SWEEP_MAX_DELAY", "2"))
+
+FRAMES = Counter("pumpportal_frames_total", "Websocket frames received from PumpPortal.")
+PARSE_ERRORS = Counter("pumpportal_parse_errors_total", "Frames that could not be decoded or handled.")
+RECONNECTS = Counter("pumpportal_reconnects_total", "PumpPortal websocket reconnections.", ["connection"])
+RUGGER_HITS = Counter("pumpportal_rugger_hits_total", "Create events from registered ruggers (after dedupe).")
+DUPLICATES = Counter("pumpportal_duplicate_events_total", "Replayed events dropped by signature.")
+ALERT_SECONDS = Histogram("alert_send_duration_seconds", "Latency of the Telegram alert send.")
+ALERT_FAILURES = Counter("alert_send_failures_total", "Alerts that Telegram did not accept.")
+SWEEPS = Counter("sweep_requests_total", "Sweep button clicks by outcome.", ["outcome"])
+AUTO_SWEEPS = Counter("autosweep_requests_total", "Buys started by auto-sweep rules, by outcome.", ["outcome"])
+AUTO_SWEEP_SUBMIT_SECONDS = Histogram(
+    "autosweep_submit_duration_seconds", "Time from a rugger create event to the auto-sweep transaction submission."
+)
+Gauge("ruggers_registered", "Addresses in the rugger index.", fn=lambda: len(rugger_index))
+Gauge("autosweep_rules", "Auto-sweep rules in the in-memory index.", fn=lambda: len(rule_index))
+
+_auto_sweep_semaphore = asyncio.Semaphore(AUTO_SWEEP_CONCURRENCY)
+_auto_sweep_tasks = set()
+_alert_tasks = set()
+
+def build_alert_message(
     token_name: str,
     symbol: str,
     rugger_address: str,
@@ -21,12 +74,7 @@ def send_telegram_message(
     sol_amount: float,
     signature: str
 ):
-    """
-    Sends a detailed message to Telegram with all important token info.
-    """
-    telegram_token = os.getenv("TELEGRAM_BOT_TOKEN")
-    telegram_channel_id = os.getenv("TELEGRAM_CHANNEL_ID")
-
+    """Returns (text, keyboard) of the rug alert for one token created by a registered rugger."""
     message = (
         "🚨 *Rug Alert!* 🚨\n\n"
         "🆕 *New Token Created by Registered Rugger*\n\n"
@@ -51,73 +99,265 @@ def send_telegram_message(
             InlineKeyboardButton("Buy 1 SOL", callback_data=f"sweep:{contract_address}:1"),
         ]
     ])
+    return message, keyboard
+
+async def send_telegram_message(
+    bot: Bot,
+    token_name: str,
+    symbol: str,
+    rugger_address: str,
+    contract_address: str,
+    market_cap_sol: float,
+    initial_buy: float,
+    sol_amount: float,
+    signature: str
+):
+    """
+    Sends a detailed message to Telegram with all important token info,
+    through the application's bot (shared connection pool).
+    """
+    telegram_channel_id = os.getenv("TELEGRAM_CHANNEL_ID")
+    message, keyboard = build_alert_message(
+        token_name, symbol, rugger_address, contract_address,
+        market_cap_sol, initial_buy, sol_amount, signature
+    )
 
-    url = f"https://api.telegram.org/bot{telegram_token}/sendMessage"
-    payload = {
-        "chat_id": telegram_channel_id,
-        "text": message,
-        "parse_mode": "Markdown",
-        "reply_markup": keyboard.to_json()
-    }
     try:
-        response = requests.post(url, data=payload)
-        if response.status_code != 200:
-            print(f"Erreur lors de l'envoi Telegram à {telegram_channel_id}: {response.text}")
+        with ALERT_SECONDS.time():
+            await bot.send_message(
+                chat_id=telegram_channel_id,
+                text=message,
+                parse_mode="Markdown",
+                reply_markup=keyboard
+            )
+    except TelegramError as e:
+        ALERT_FAILURES.inc()
+        print(f"Erreur lors de l'envoi Telegram à {telegram_channel_id}: {e}")
     except Exception as e:
+        ALERT_FAILURES.inc()
         print(f"Exception lors de l'envoi Telegram à {telegram_channel_id}: {e}")
 
-def load_addresses():
-    path = os.path.join(os.path.dirname(__file__), "data", "adresses.json")
-    with open(path, "r") as f:
-        return json.load(f)
+class StreamIdle(Exception):
+    """The PumpPortal stream stayed silent longer than its idle timeout."""
 
-addresses = load_addresses()
+class SignatureLRU:
+    """Bounded set of recently seen signatures, used to drop events replayed after a reconnect."""
 
-async def fetch_new_tokens():
-    print("Start websocket for new tokens by specific creator...")
- 
-    uri = "wss://pumpportal.fun/api/data"
+    def __init__(self, maxsize=DEDUPE_SIZE):
+        self.maxsize = maxsize
+        self._seen = OrderedDict()
+
+    def seen(self, signature):
+        """Returns True if `signature` was already seen, and records it otherwise."""
+        if not signature:
+            return False
+        if signature in self._seen:
+            self._seen.move_to_end(signature)
+            return True
+        self._seen[signature] = None
+        if len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+        return False
+
+def reconnect_delay(attempt):
+    """Exponential backoff with jitter: ~0.1-0.25 s on the first retry, capped at RECONNECT_MAX_DELAY."""
+    delay = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+async def handle_event(bot, data, seen):
+    """
+    Starts the matching auto-sweeps, then queues the subscribers' DMs and
+    the channel alert for a create event from a registered rugger (once per
+    signature). Nothing here waits on Telegram, so the stream keeps being read.
+    """
+    if (
+        isinstance(data, dict)
+        and data.get("txType") == "create"
+        and data.get("traderPublicKey") in rugger_index
+    ):
+        if seen.seen(data.get("signature")):
+            DUPLICATES.inc()
+            return
+        RUGGER_HITS.inc()
+        pumpfun.remember_curve_state(data)
+        # Les achats automatiques partent avant l'alerte, sans l'attendre
+        dispatch_auto_sweeps(bot, data)
+        alert = (
+            data.get("name", ""),
+            data.get("symbol", ""),
+            data.get("traderPublicKey", ""),
+            data.get("mint", ""),
+            float(data.get("marketCapSol", 0)),
+            float(data.get("initialBuy", 0)),
+            float(data.get("solAmount", 0)),
+            data.get("signature", "")
+        )
+        # DMs des abonnés envoyés en arrière-plan par le scheduler (limites Telegram)
+        subscribers = subscription_index.subscribers(data.get("traderPublicKey"))
+        if subscribers:
+            alert_scheduler.submit(subscribers, *build_alert_message(*alert))
+        # Alerte du canal hors de la boucle de lecture : l'attente du rate limiter (jusqu'au
+        # retry_after d'un 429) ne doit pas empêcher recv() de lire les frames et les pongs
+        task = asyncio.create_task(send_telegram_message(bot, *alert))
+        _alert_tasks.add(task)
+        task.add_done_callback(_alert_tasks.discard)
+
+async def _consume(bot, websocket, seen, idle_timeout=None):
+    while True:
+        # Un flux silencieux trop longtemps est considéré comme bloqué
+        try:
+            frame = await asyncio.wait_for(websocket.recv(decode=False), idle_timeout)
+        except asyncio.TimeoutError:
+            raise StreamIdle(idle_timeout) from None
+        FRAMES.inc()
+        try:
+            # Pré-filtre : le JSON n'est décodé que si le créateur est un rugger connu
+            data = firehose.decode_if_match(frame, rugger_index)
+            if data is not None:
+                await handle_event(bot, data, seen)
+        except Exception as e:
+            PARSE_ERRORS.inc()
+            print(f"Erreur parsing event : {e}")
+
+async def _supervise(label, session):
+    """
+    Supervised PumpPortal connection: reconnects with jittered exponential
+    backoff and runs `session(websocket)` (subscribe + consume) on every
+    connection. Stalls are detected through websocket pings and idle timeouts.
+    """
+    attempt = 0
+    while True:
+        connected_at = None
+        try:
+            async with websockets.connect(
+                PUMPPORTAL_WS_URI,
+                open_timeout=10,
+                ping_interval=PING_INTERVAL,
+                ping_timeout=PING_TIMEOUT,
+            ) as websocket:
+                connected_at = time.monotonic()
+                await session(websocket)
+        except asyncio.CancelledError:
+            raise
+        except StreamIdle as e:
+            print(f"WebSocket pumpportal.fun ({label}) silencieux depuis {e}s, reconnexion")
+        except asyncio.TimeoutError:
+            # Connexion ou handshake trop long (open_timeout)
+            print(f"Timeout de connexion au WebSocket pumpportal.fun ({label}), nouvelle tentative")
+        except Exception as e:
+            print(f"Erreur WebSocket pumpportal.fun ({label}) : {e}")
+        # Une connexion restée stable remet le backoff à zéro
+        if connected_at is not None and time.monotonic() - connected_at > STABLE_CONNECTION:
+            attempt = 0
+        delay = reconnect_delay(attempt)
+        attempt += 1
+        RECONNECTS.inc(connection=label)
+        await asyncio.sleep(delay)
+
+class AccountShard:
+    """One PumpPortal connection subscribed to at most ACCOUNT_KEYS_PER_CONNECTION rugger accounts."""
+
+    def __init__(self, bot, index, seen):
+        self.bot = bot
+        self.label = f"accounts#{index}"
+        self.keys = set()
+        self.seen = seen
+        self.websocket = None
+
+    async def _send(self, method, keys):
+        if self.websocket is not None and keys:
+            await self.websocket.send(json.dumps({"method": method, "keys": sorted(keys)}))
+
+    async def session(self, websocket):
+        self.websocket = websocket
+        try:
+            await self._send("subscribeAccountTrade", self.keys)
+            # Les comptes suivis sont peu actifs : pas de timeout d'inactivité, seuls les pings comptent
+            await _consume(self.bot, websocket, self.seen)
+        finally:
+            self.websocket = None
+
+    async def add(self, keys):
+        self.keys |= keys
+        await self._send("subscribeAccountTrade", keys)
+
+async def fetch_account_trades(bot):
+    """
+    Subscribes only to registered rugger accounts (subscribeAccountTrade), split
+    across connections. Keys follow the rugger index live: new ruggers are
+    subscribed as soon as they are saved.
+    """
+    print("Start websocket for registered rugger accounts...")
+    seen = SignatureLRU()
+    loop = asyncio.get_running_loop()
+    changes = asyncio.Queue()
+
+    def on_change(added):
+        # Appelé depuis le thread qui a modifié l'index
+        loop.call_soon_threadsafe(changes.put_nowait, added)
+
+    shards = []
+    tasks = []
+
+    async def assign(keys):
+        keys = set(keys) - set().union(*(s.keys for s in shards))
+        for shard in shards:
+            room = ACCOUNT_KEYS_PER_CONNECTION - len(shard.keys)
+            if room > 0 and keys:
+                batch = set(list(keys)[:room])
+                keys -= batch
+                await shard.add(batch)
+        while keys:
+            shard = AccountShard(bot, len(shards), seen)
+            batch = set(list(keys)[:ACCOUNT_KEYS_PER_CONNECTION])
+            keys -= batch
+            await shard.add(batch)
+            shards.append(shard)
+            tasks.append(asyncio.create_task(_supervise(shard.label, shard.session)))
+
+    rugger_index.add_listener(on_change)
     try:
-        async with websockets.connect(uri) as websocket:
-            payload = {
-                "method": "subscribeNewToken",
-            }
-            await websocket.send(json.dumps(payload))
-
-            async for message in websocket:
-
-                addresses = load_addresses()
-                try:
-                    data = json.loads(message)
-                    
-                    if (
-                        isinstance(data, dict)
-                        and data.get("txType") == "create"
-                        and data.get("traderPublicKey") in addresses
-                    ):
-                        send_telegram_message(
-                            data.get("name", ""),
-                            data.get("symbol", ""),
-                            data.get("traderPublicKey", ""),
-                            data.get("mint", ""),
-                            float(data.get("marketCapSol", 0)),
-                            float(data.get("initialBuy", 0)),
-                            float(data.get("solAmount", 0)),
-                            data.get("signature", "")
-                        )
-                except Exception as e:
-                    print(f"Erreur parsing event : {e}")
-    except Exception as e:
-        print(f"Erreur WebSocket pumpportal.fun : {e}")
-        await asyncio.sleep(10)
-        await fetch_new_tokens()
+        await assign(rugger_index.snapshot())
+        if not shards:
+            shards.append(AccountShard(bot, 0, seen))
+            tasks.append(asyncio.create_task(_supervise(shards[0].label, shards[0].session)))
+        while True:
+            try:
+                added = await asyncio.wait_for(changes.get(), ACCOUNT_INDEX_POLL)
+            except asyncio.TimeoutError:
+                # Prend en compte les ruggers ajoutés par un autre processus
+                rugger_index.refresh()
+                continue
+            await assign(added)
+    finally:
+        rugger_index.remove_listener(on_change)
+        for task in tasks:
+            task.cancel()
 
-def create_wallet():
+async def fetch_new_tokens(bot: Bot):
+    """
+    Entry point of the PumpPortal listener. In "firehose" mode (default) it
+    follows every token creation; in "accounts" mode it subscribes only to the
+    registered rugger accounts. Alerts are sent once per signature.
+    """
+    if PUMPPORTAL_MODE == "accounts":
+        await fetch_account_trades(bot)
+        return
+    print("Start websocket for new tokens by specific creator...")
+    seen = SignatureLRU()
+
+    async def session(websocket):
+        await websocket.send(json.dumps({"method": "subscribeNewToken"}))
+        await _consume(bot, websocket, seen, IDLE_TIMEOUT)
+
+    await _supervise("firehose", session)
+
+async def create_wallet():
     """
     Crée un nouveau wallet via l'API PumpPortal et retourne (pubkey, privkey_base58).
     """
     try:
-        response = requests.get(url="https://pumpportal.fun/api/create-wallet")
+        response = await get_client().get(url="https://pumpportal.fun/api/create-wallet")
         data = response.json()
         pubkey = data.get("walletPublicKey")
         privkey_base58 = data.get("privateKey")
@@ -126,165 +366,215 @@ def create_wallet():
         print(f"Erreur lors de la création du wallet PumpPortal : {e}")
         return None, None
 
+def _sweep_outcome(outcome):
+    SWEEPS.inc(outcome=outcome)
+    tracing.annotate(outcome=outcome)
+
 async def sweep_callback_handler(update, context):
+    """Buy button handler; each click is traced (one span per stage) under its own correlation id."""
+    with tracing.trace("sweep", user=str(update.effective_user.id)):
+        await _sweep(update, context)
+
+async def _sweep(update, context):
     query = update.callback_query
-    await query.answer()
+    with tracing.span("answer"):
+        await query.answer()
     try:
-        _, contract_address, amount = query.data.split(":") 
+        with tracing.span("parse"):
+            _, contract_address, amount = query.data.split(":")
         user_id = str(update.effective_user.id)
-        print(f"[DEBUG] Sweep request: user={user_id}, contract={contract_address}, amount={amount}")
-
-        # Retrieve privkey_base58 and check validity before using Keypair
-        pubkey, privkey_base58 = wallet.get_wallet_for_user(user_id)
-        if not privkey_base58:
-            await context.application.bot.send_message(
-                chat_id=update.effective_user.id,
-                text="No wallet found for your account.",
-                parse_mode="Markdown"
-            )
-            return
+        tracing.annotate(mint=contract_address, amount=amount)
+        print(f"[DEBUG] Sweep request {tracing.current_trace_id()}: user={user_id}, contract={contract_address}, amount={amount}")
+        await execute_sweep(context.application.bot, user_id, contract_address, amount)
+    except Exception as e:
+        _sweep_outcome("error")
+        print(f"[DEBUG] Error in sweep_callback_handler: {e}")
+        await context.application.bot.send_message(
+            chat_id=update.effective_user.id,
+            text=f"Error: {e}"
+        )
 
-        try:
-            keypair = Keypair.from_base58_string(privkey_base58)
-        except Exception as e:
-            await context.application.bot.send_message(
-                chat_id=update.effective_user.id,
-                text=f"Error loading your wallet: {e}",
+async def execute_sweep(bot, user_id, contract_address, amount, slippage=10, auto=False, detected_at=None):
+    """
+    Runs one sweep for `user_id` (wallet, token gate, buy) and reports the
+    outcome to the user by DM, then follows the transaction to confirmation.
+    Shared by the buy buttons and auto-sweep rules (`auto=True`, where
+    `detected_at` is the perf_counter() time the create event was handled).
+    """
+    record_outcome = _auto_sweep_outcome if auto else _sweep_outcome
+
+    # Keypair déchiffré une seule fois puis servi depuis le cache
+    try:
+        with tracing.span("wallet", SWEEP_STAGE_SECONDS):
+            pubkey, keypair = wallet.get_keypair_for_user(user_id)
+    except Exception as e:
+        record_outcome("wallet_error")
+        await bot.send_message(
+            chat_id=user_id,
+            text=f"Error loading your wallet: {e}",
+            parse_mode="Markdown"
+        )
+        return
+    if keypair is None:
+        record_outcome("no_wallet")
+        await bot.send_message(
+            chat_id=user_id,
+            text="No wallet found for your account.",
+            parse_mode="Markdown"
+        )
+        return
+
+    # Statut $RugSweeper servi depuis le cache, vérification live seulement si absent
+    try:
+        with tracing.span("token_gate", SWEEP_STAGE_SECONDS):
+            eligible = await token_gate.is_eligible(pubkey)
+    except Exception as e:
+        record_outcome("gate_error")
+        await bot.send_message(
+            chat_id=user_id,
+            text=f"Erreur lors de la vérification du solde de tokens : {e}",
+            parse_mode="Markdown"
+        )
+        return
+    if not eligible:
+        record_outcome("not_eligible")
+        await bot.send_message(
+            chat_id=user_id,
+            text=(
+                f"❌ You must hold at least {token_gate.min_amount:,} tokens of mint `{token_gate.mint}` "
+                "to use this feature.\n"
+                f"🔗 [Buy more $RugSweeper](https://pump.fun/coin/{token_gate.mint})"
+            ),
+            parse_mode="Markdown"
+        )
+        return
+
+    # Validate contract_address (should be base58, no '-')
+    try:
+        # Only allow valid base58 addresses (no '-')
+        if '-' in contract_address:
+            raise ValueError("Invalid contract address format (contains '-').")
+        pubkey = str(keypair.pubkey())
+        with tracing.span("trade", SWEEP_STAGE_SECONDS):
+            result = await buy_token(pubkey, contract_address, keypair, amount, slippage)
+        if detected_at is not None:
+            AUTO_SWEEP_SUBMIT_SECONDS.observe(time.perf_counter() - detected_at)
+        record_outcome("success" if result.success else result.error_code)
+        tracing.annotate(signature=result.signature)
+        if result.success:
+            msg = (
+                f"{'🤖 Auto-sweep triggered!' if auto else '🧹 Sweep request received!'}\n"
+                f"User `{user_id}` will buy `{amount} SOL` of token:\n"
+                f"`{contract_address}`\n\n"
+                f"Signature: `{result.signature}`\n"
+                f"🔗 [View on Solscan]({result.transaction_url})"
+            )
+        elif result.error_code == ERR_INSUFFICIENT_LAMPORTS:
+            msg = (
+                f"❌ {'Auto-sweep' if auto else 'Sweep request'} failed for user `{user_id}` on token `{contract_address}`.\n"
+                f"Not enough lamports! Deposit more SOL.\n"
+                f"Lamports available: `{result.lamports_available}`\n"
+                f"Lamports required: `{result.lamports_needed}`"
+            )
+        else:
+            msg = (
+                f"❌ {'Auto-sweep' if auto else 'Sweep request'} failed ({result.error_code}).\n"
+                f"Reason: {result.message}"
+            )
+        # Référence à communiquer aux admins (/trace <ref>)
+        msg += f"\nRef: `{tracing.current_trace_id()}`"
+        with tracing.span("reply"):
+            sent = await bot.send_message(
+                chat_id=user_id,
+                text=msg + ("\n\n⏳ Waiting for confirmation..." if result.success else ""),
                 parse_mode="Markdown"
             )
-            return
-        
-        mint_to_check = "8DceEqiRgGMsgWgev5WUVxRUad8r7jeDi4BRQ7LDsgK4"
-        min_amount = 300_000
+        if result.success:
+            # Le message sera complété avec le résultat on-chain
+            confirmation_tracker.track(
+                bot, result.signature, sent.chat_id, sent.message_id, msg, result.blockhash
+            )
+    except Exception as e:
+        record_outcome("invalid_contract")
+        await bot.send_message(
+            chat_id=user_id,
+            text=f"Invalid contract address `{contract_address}`: {e}",
+            parse_mode="Markdown"
+        )
 
+def _auto_sweep_outcome(outcome):
+    AUTO_SWEEPS.inc(outcome=outcome)
+    tracing.annotate(outcome=outcome)
+
+async def _auto_sweep(bot, rule, contract_address, detected_at):
+    with tracing.trace("autosweep", user=rule.user_id, rugger=rule.rugger):
+        tracing.annotate(mint=contract_address, amount=rule.amount)
         try:
-            # Utilisation de l'API Helius pour récupérer le solde du token
-            helius_api_key = os.getenv("HELIUS_API_KEY")
-            helius_url = f"https://mainnet.helius-rpc.com/?api-key={helius_api_key}"
-            headers = {"Content-Type": "application/json"}
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getTokenAccountsByOwner",
-                "params": [
-                    pubkey,
-                    {"mint": mint_to_check},
-                    {"encoding": "jsonParsed"}
-                ]
-            }
-            resp = requests.post(helius_url, json=payload, headers=headers)
-            if resp.status_code == 200:
-                result = resp.json().get("result", {})
-                value = result.get("value", [])
-                found = False
-                for acc in value:
-                    amount = float(acc["account"]["data"]["parsed"]["info"]["tokenAmount"]["uiAmount"])
-                    if amount >= min_amount:
-                        found = True
-                        break
-                if not found:
-                    await context.application.bot.send_message(
-                        chat_id=update.effective_user.id,
-                      text=(
-    f"❌ You must hold at least {min_amount:,} tokens of mint `{mint_to_check}` "
-    "to use this feature.\n"
-    f"🔗 [Buy more $RugSweeper](https://pump.fun/coin/{mint_to_check})"
-),  
-                        parse_mode="Markdown"
-                    )
-                    return
-            else:
-                return
-        except Exception as e:
-            await context.application.bot.send_message(
-                chat_id=update.effective_user.id,
-                text=f"Erreur lors de la vérification du solde de tokens : {e}",
-                parse_mode="Markdown"
-            )
+            with tracing.span("queue"):
+                remaining = AUTO_SWEEP_MAX_DELAY - (time.perf_counter() - detected_at)
+                await asyncio.wait_for(_auto_sweep_semaphore.acquire(), max(remaining, 0))
+        except asyncio.TimeoutError:
+            _auto_sweep_outcome("stale")
+            try:
+                await bot.send_message(
+                    chat_id=rule.user_id,
+                    text=(
+                        f"⏭ Auto-sweep skipped on token `{contract_address}`: "
+                        f"not started within {AUTO_SWEEP_MAX_DELAY:g}s of the launch."
+                    ),
+                    parse_mode="Markdown"
+                )
+            except Exception as e:
+                print(f"Erreur lors de l'envoi du message d'auto-sweep à {rule.user_id} : {e}")
             return
-
-        # Validate contract_address (should be base58, no '-')
         try:
-            # Only allow valid base58 addresses (no '-')
-            if '-' in contract_address:
-                raise ValueError("Invalid contract address format (contains '-').")
-            pubkey = str(keypair.pubkey())
-            success, result_msg = buy_token(pubkey, contract_address, keypair, amount)
-            # Correction: Vérification de la présence de la clé 'result' si result_msg est un dict
-            if isinstance(result_msg, dict):
-                signature = result_msg.get('result', None)
-                if not signature:
-                    signature = result_msg.get('signature', None)
-                if not signature:
-                    signature = "Signature non disponible"
-            else:
-                signature = result_msg if isinstance(result_msg, str) else "Signature non disponible"
-            if success:
-                msg = (
-                    f"🧹 Sweep request received!\n"
-                    f"User `{user_id}` will buy `{amount} SOL` of token:\n"
-                    f"`{contract_address}`\n\n"
-                    f"Signature: `{signature}`"
-                ) 
-                
-            else:
-                # Ajout affichage lamports requis/disponibles si présents dans le message d'erreur
-                lamports_needed = None
-                lamports_available = None
-                if isinstance(result_msg, dict):
-                    lamports_needed = result_msg.get("lamports_needed")
-                    lamports_available = result_msg.get("lamports_available")
-                elif isinstance(result_msg, str):
-                    import re
-                    m = re.search(r"insufficient lamports (\d+), need (\d+)", result_msg)
-                    if m:
-                        lamports_available = int(m.group(1))
-                        lamports_needed = int(m.group(2))
-                if lamports_needed and lamports_available:
-                    msg = (
-                        f"❌ Sweep request failed for user `{user_id}` on token `{contract_address}`.\n"
-                        f"Reason: {result_msg}\n"
-                        f"Lamports available: `{lamports_available}`\n"
-                        f"Lamports required: `{lamports_needed}`"
-                    )
-                else:
-                    msg = (
-                        f"❌ Sweep request failed. No enought lamports ! Deposit more sol \n"
-                         
-                    )
-            await context.application.bot.send_message(
-                chat_id=update.effective_user.id,
-                text=msg,
-                parse_mode="Markdown"
+            await execute_sweep(
+                bot, rule.user_id, contract_address, rule.amount, rule.slippage, auto=True, detected_at=detected_at
             )
         except Exception as e:
-            await context.application.bot.send_message(
-                chat_id=update.effective_user.id,
-                text=f"Invalid contract address `{contract_address}`: {e}",
-                parse_mode="Markdown"
-            )
-    except Exception as e:
-        print(f"[DEBUG] Error in sweep_callback_handler: {e}")
-        await context.application.bot.send_message(
-            chat_id=update.effective_user.id,
-            text=f"Error: {e}"
-        )
- 
+            _auto_sweep_outcome("error")
+            print(f"Erreur lors de l'auto-sweep de {rule.user_id} sur {contract_address} : {e}")
+        finally:
+            _auto_sweep_semaphore.release()
+
+def dispatch_auto_sweeps(bot, data):
+    """
+    Starts, without waiting for them, the buys of every auto-sweep rule
+    matching a rugger create event. At most AUTO_SWEEP_CONCURRENCY run at once;
+    buys still queued AUTO_SWEEP_MAX_DELAY after the event are dropped as
+    "stale". Returns the number of buys started.
+    """
+    detected_at = time.perf_counter()
+    rules = rule_index.match(data.get("traderPublicKey"), float(data.get("marketCapSol", 0)))
+    for rule in rules:
+        task = asyncio.create_task(_auto_sweep(bot, rule, data.get("mint", ""), detected_at))
+        _auto_sweep_tasks.add(task)
+        task.add_done_callback(_auto_sweep_tasks.discard)
+    return len(rules)
+
+async def stop_auto_sweeps():
+    for task in list(_auto_sweep_tasks):
+        task.cancel()
+    await asyncio.gather(*_auto_sweep_tasks, return_exceptions=True)
+
+async def stop_alerts():
+    """Cancels the channel alerts still waiting for the rate limiter."""
+    for task in list(_alert_tasks):
+        task.cancel()
+    await asyncio.gather(*_alert_tasks, return_exceptions=True)
+
+async def _main():
+    # Lancement autonome du listener (sans le reste du bot)
+    async with ExtBot(os.getenv("TELEGRAM_BOT_TOKEN"), rate_limiter=TelegramRateLimiter(alert_scheduler)) as bot:
+        alert_scheduler.start(bot)
+        try:
+            await fetch_new_tokens(bot)
+        finally:
+            await stop_alerts()
+            await alert_scheduler.stop()
+
 if __name__ == "__main__":
-    loop = asyncio.get_event_loop()
     try:
-        loop.run_until_complete(fetch_new_tokens())
+        asyncio.run(_main())
     except KeyboardInterrupt:
         print("Arrêt manuel du bot.")
-    finally:
-        loop.close()
-    loop = asyncio.get_event_loop()
-    try:
-        tasks = [
-            fetch_new_tokens(),
-        ]
-        loop.run_until_complete(asyncio.gather(*tasks))
-    except KeyboardInterrupt:
-        print("Arrêt manuel du bot.")
-    finally:
-        loop.close()
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from http_client import get_client
+from metrics import Counter, Gauge
+
+# Liste d'endpoints séparés par des virgules ; par défaut Helius (si clé) puis RPC_URL
+RPC_URLS = os.getenv("RPC_URLS", "")
+DEFAULT_RPC_URL = os.getenv("RPC_URL", "https://api.mainnet-beta.solana.com")
+# Sondes de santé en arrière-plan (secondes)
+PROBE_INTERVAL = float(os.getenv("RPC_PROBE_INTERVAL", "15"))
+PROBE_TIMEOUT = 5
+# Un endpoint est écarté après ce nombre d'échecs consécutifs, jusqu'à un succès
+MAX_CONSECUTIVE_FAILURES = 3
+MAX_COOLDOWN = 30
+EWMA_ALPHA = 0.2
+
+RPC_REQUESTS = Counter("rpc_requests_total", "JSON-RPC requests by endpoint and outcome.", ["endpoint", "outcome"])
+RPC_LATENCY = Gauge("rpc_endpoint_latency_seconds", "Smoothed JSON-RPC latency per endpoint.", ["endpoint"])
+RPC_HEALTHY = Gauge("rpc_endpoint_healthy", "1 if the endpoint is currently selectable.", ["endpoint"])
+
+
+class RpcError(RuntimeError):
+    """JSON-RPC error answered by the node (not retried on another endpoint)."""
+
+    def __init__(self, error):
+        super().__init__(error.get("message", error) if isinstance(error, dict) else error)
+        self.error = error
+
+
+def helius_url():
+    return f"https://mainnet.helius-rpc.com/?api-key={os.getenv('HELIUS_API_KEY')}"
+
+
+def default_urls():
+    if RPC_URLS:
+        return [u.strip() for u in RPC_URLS.split(",") if u.strip()]
+    urls = [helius_url()] if os.getenv("HELIUS_API_KEY") else []
+    return urls + [DEFAULT_RPC_URL]
+
+
+class Endpoint:
+    """One RPC URL with its smoothed latency, error rate and cooldown."""
+
+    def __init__(self, url):
+        self.url = url
+        # Libellé sans la query string (clé d'API)
+        self.label = urlsplit(url).netloc or url
+        self.latency = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.successes = 0
+        self.errors = 0
+
+    @property
+    def healthy(self):
+        return self.failures < MAX_CONSECUTIVE_FAILURES and time.monotonic() >= self.cooldown_until
+
+    @property
+    def score(self):
+        # Un endpoint jamais mesuré passe en premier pour être évalué
+        return (self.latency or 0.0) * (1 + 4 * self.error_rate)
+
+    def record_success(self, latency):
+        self.latency = latency if self.latency is None else (1 - EWMA_ALPHA) * self.latency + EWMA_ALPHA * latency
+        self.error_rate *= 1 - EWMA_ALPHA
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.successes += 1
+        RPC_LATENCY.set(self.latency, endpoint=self.label)
+        RPC_HEALTHY.set(1, endpoint=self.label)
+
+    def record_failure(self, retry_after=None):
+        self.error_rate = (1 - EWMA_ALPHA) * self.error_rate + EWMA_ALPHA
+        self.failures += 1
+        self.errors += 1
+        delay = retry_after if retry_after is not None else min(MAX_COOLDOWN, 0.5 * 2 ** (self.failures - 1))
+        self.cooldown_until = time.monotonic() + delay
+        RPC_HEALTHY.set(0, endpoint=self.label)
+
+
+def _retry_after(response):
+    try:
+        return min(MAX_COOLDOWN, float(response.headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return None
+
+
+class RpcPool:
+    """
+    Sends JSON-RPC requests to the fastest healthy endpoint.
+
+    Endpoints are ranked by smoothed latency weighted by their recent error
+    rate. A 429, a 5xx or a transport error puts the endpoint in cooldown
+    (Retry-After when given) and the request fails over to the next one;
+    JSON-RPC errors are returned as-is. A background task probes every
+    endpoint with getHealth so latencies stay current without traffic.
+    """
+
+    def __init__(self, urls, probe_interval=PROBE_INTERVAL):
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.probe_interval = probe_interval
+        self._task = None
+
+    def ranked(self):
+        return sorted(self.endpoints, key=lambda e: (not e.healthy, e.score))
+
+    async def request(self, method, params, timeout=None):
+        """Returns the full JSON-RPC response body from the first endpoint that answers."""
+        payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        error = None
+        for endpoint in self.ranked():
+            start = time.perf_counter()
+            try:
+                response = await get_client().post(endpoint.url, json=payload, timeout=timeout or httpx.USE_CLIENT_DEFAULT)
+            except httpx.TransportError as e:
+                endpoint.record_failure()
+                RPC_REQUESTS.inc(endpoint=endpoint.label, outcome="transport_error")
+                error = e
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                endpoint.record_failure(_retry_after(response))
+                RPC_REQUESTS.inc(endpoint=endpoint.label, outcome=str(response.status_code))
+                error = httpx.HTTPStatusError(
+                    f"{endpoint.label}: HTTP {response.status_code}", request=response.request, response=response
+                )
+                continue
+            try:
+                body = response.json()
+            except ValueError:
+                endpoint.record_failure()
+                RPC_REQUESTS.inc(endpoint=endpoint.label, outcome="invalid_response")
+                error = httpx.DecodingError(f"{endpoint.label}: invalid JSON-RPC response", request=response.request)
+                continue
+            endpoint.record_success(time.perf_counter() - start)
+            RPC_REQUESTS.inc(endpoint=endpoint.label, outcome="ok")
+            return body
+        raise error or RuntimeError("Aucun endpoint RPC configuré")
+
+    async def call(self, method, params, timeout=None):
+        """Returns the `result` of a JSON-RPC call; raises RpcError on a JSON-RPC error."""
+        body = await self.request(method, params, timeout)
+        if "error" in body:
+            raise RpcError(body["error"])
+        return body["result"]
+
+    async def probe(self, endpoint):
+        start = time.perf_counter()
+        try:
+            response = await get_client().post(
+                endpoint.url, json={"jsonrpc": "2.0", "id": 1, "method": "getHealth"}, timeout=PROBE_TIMEOUT
+            )
+            healthy = response.status_code == 200 and response.json().get("result") == "ok"
+        except (httpx.HTTPError, ValueError):
+            healthy = False
+        if healthy:
+            endpoint.record_success(time.perf_counter() - start)
+        else:
+            endpoint.record_failure()
+
+    async def _run(self):
+        while True:
+            await asyncio.gather(*(self.probe(e) for e in self.endpoints))
+            await asyncio.sleep(self.probe_interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+rpc_pool = RpcPool(default_urls())
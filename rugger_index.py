@@ -0,0 +1,98 @@
+import time
+import threading
+
+import utils
+
+# Intervalle minimal entre deux vérifications de la version du registre (secondes)
+CHECK_INTERVAL = 1.0
+
+
+class RuggerIndex:
+    """
+    In-memory set of registered rugger addresses.
+
+    Membership checks are O(1) and never touch the database. The set is updated
+    in place (O(1) per address) by `utils.save_address`; writes from other
+    processes are picked up by polling the registry version (at most once per
+    `check_interval`) and loading only the rows inserted since the last sync.
+    Listeners registered with `add_listener` are called with the set of added
+    addresses on every change (the registry has no removal path).
+    """
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._addresses = set()
+        self._last_rowid = 0
+        self._version = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Registers `callback(added)`; it runs on the thread that changed the index."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, added):
+        if not added:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(frozenset(added))
+            except Exception as e:
+                print(f"Erreur dans un listener de l'index des ruggers : {e}")
+
+    def _sync(self):
+        """Loads rows inserted since the last sync; returns the new addresses."""
+        version = utils.registry_version()
+        rows = utils.addresses_since(self._last_rowid)
+        added = set()
+        if rows:
+            added = {row["address"] for row in rows} - self._addresses
+            self._addresses.update(added)
+            self._last_rowid = rows[-1]["rowid"]
+        self._version = version
+        return added
+
+    def snapshot(self):
+        """Returns a copy of the current set of addresses."""
+        self.refresh()
+        with self._lock:
+            return frozenset(self._addresses)
+
+    def refresh(self):
+        """Loads new registry rows if the version changed, at most once per `check_interval`."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            if utils.registry_version() != self._version:
+                with self._lock:
+                    added = self._sync()
+                self._notify(added)
+        except Exception as e:
+            # Base verrouillée ou indisponible : on garde l'index actuel
+            print(f"Erreur lors du rechargement de l'index des ruggers : {e}")
+
+    def add(self, address):
+        """Adds an address written by this process without querying the registry."""
+        with self._lock:
+            if address in self._addresses:
+                return
+            self._addresses.add(address)
+        self._notify({address})
+
+    def __contains__(self, address):
+        self.refresh()
+        return address in self._addresses
+
+    def __len__(self):
+        self.refresh()
+        return len(self._addresses)
+
+
+rugger_index = RuggerIndex()
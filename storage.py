@@ -0,0 +1,45 @@
+import os
+import sqlite3
+import threading
+
+# Une connexion par thread et par fichier (sqlite3 interdit le partage entre threads)
+_local = threading.local()
+# Fichiers dont le schéma a déjà été initialisé dans ce processus
+_initialized = set()
+_init_lock = threading.Lock()
+
+
+def get_connection(path, init=None):
+    """
+    Returns this thread's SQLite connection to `path`, opened in WAL mode.
+
+    WAL lets the listener read while the bot writes; `synchronous=NORMAL` keeps
+    commits durable across application crashes without an fsync per write.
+    `init(conn)` (schema creation, migrations) runs once per file per process.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[path] = conn
+    if init is not None and path not in _initialized:
+        with _init_lock:
+            if path not in _initialized:
+                init(conn)
+                _initialized.add(path)
+    return conn
+
+
+def close_connections():
+    """Closes the connections opened by the calling thread."""
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
@@ -0,0 +1,197 @@
+import os
+import time
+import threading
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from storage import get_connection
+from utils import is_valid_solana_address, address_exists
+
+SUBSCRIPTIONS_DB = os.getenv("SUBSCRIPTIONS_DB", "data/subscriptions.db")
+# Abonnement aux alertes de tous les ruggers
+ALL_RUGGERS = "*"
+MAX_SUBSCRIPTIONS_PER_CHAT = 100
+# Intervalle minimal entre deux vérifications de la version des abonnements (secondes)
+CHECK_INTERVAL = 1.0
+
+USAGE = (
+    "Receive rug alerts in this chat:\n\n"
+    "/subscribe all — every registered rugger\n"
+    "/subscribe <rugger> — one rugger\n"
+    "/unsubscribe <rugger|all> — stop one subscription\n"
+    "/unsubscribe — stop everything"
+)
+
+
+def _init_subscriptions(conn):
+    with conn:
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                chat_id TEXT NOT NULL,
+                rugger TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (chat_id, rugger)
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('subscriptions_version', 0);
+            """
+        )
+
+
+def _subscriptions_db():
+    return get_connection(SUBSCRIPTIONS_DB, _init_subscriptions)
+
+
+def _bump_version(conn):
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'subscriptions_version'")
+
+
+def subscriptions_version():
+    row = _subscriptions_db().execute("SELECT value FROM meta WHERE key = 'subscriptions_version'").fetchone()
+    return row[0] if row else 0
+
+
+def load_subscriptions():
+    """Returns [(chat_id, rugger)] for every subscription."""
+    rows = _subscriptions_db().execute("SELECT chat_id, rugger FROM subscriptions ORDER BY rowid")
+    return [(row["chat_id"], row["rugger"]) for row in rows]
+
+
+def list_subscriptions(chat_id):
+    rows = _subscriptions_db().execute(
+        "SELECT rugger FROM subscriptions WHERE chat_id = ? ORDER BY rowid", (str(chat_id),)
+    )
+    return [row["rugger"] for row in rows]
+
+
+def subscribe(chat_id, rugger):
+    """Returns True if the subscription is new."""
+    conn = _subscriptions_db()
+    with conn:
+        added = conn.execute(
+            "INSERT OR IGNORE INTO subscriptions (chat_id, rugger, created_at) VALUES (?, ?, ?)",
+            (str(chat_id), rugger, time.time()),
+        ).rowcount
+        _bump_version(conn)
+    subscription_index.reload()
+    return added > 0
+
+
+def unsubscribe(chat_id, rugger=None):
+    """Removes one subscription, or all of the chat's if `rugger` is None; returns how many were removed."""
+    conn = _subscriptions_db()
+    with conn:
+        if rugger is None:
+            removed = conn.execute("DELETE FROM subscriptions WHERE chat_id = ?", (str(chat_id),)).rowcount
+        else:
+            removed = conn.execute(
+                "DELETE FROM subscriptions WHERE chat_id = ? AND rugger = ?", (str(chat_id), rugger)
+            ).rowcount
+        _bump_version(conn)
+    subscription_index.reload()
+    return removed
+
+
+class SubscriptionIndex:
+    """
+    In-memory subscriber sets keyed by rugger address (ALL_RUGGERS for the
+    global subscription), rebuilt after each write from this process and when
+    the subscriptions version changes (checked at most once per `check_interval`).
+    """
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._by_rugger = {}  # rugger -> frozenset(chat_id)
+        self._version = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def reload(self):
+        with self._lock:
+            version = subscriptions_version()
+            by_rugger = {}
+            for chat_id, rugger in load_subscriptions():
+                by_rugger.setdefault(rugger, set()).add(chat_id)
+            self._by_rugger = {rugger: frozenset(chats) for rugger, chats in by_rugger.items()}
+            self._version = version
+
+    def refresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            if subscriptions_version() != self._version:
+                self.reload()
+        except Exception as e:
+            # Base verrouillée ou indisponible : on garde les abonnements actuels
+            print(f"Erreur lors du rechargement des abonnements : {e}")
+
+    def subscribers(self, rugger):
+        """Chats to alert for a token created by `rugger` (global and per-rugger subscribers)."""
+        self.refresh()
+        by_rugger = self._by_rugger
+        return by_rugger.get(ALL_RUGGERS, frozenset()) | by_rugger.get(rugger, frozenset())
+
+    def __len__(self):
+        return len(set().union(*self._by_rugger.values()))
+
+
+subscription_index = SubscriptionIndex()
+
+
+def _target(args):
+    """Returns (rugger, None) or (None, error message) for a /subscribe or /unsubscribe argument."""
+    if args[0].lower() == "all":
+        return ALL_RUGGERS, None
+    if not is_valid_solana_address(args[0]):
+        return None, "Invalid Solana address format."
+    return args[0], None
+
+
+async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/subscribe [all|<rugger>]: DM alerts for every rugger or for one of them."""
+    chat_id = update.effective_chat.id
+    args = context.args or []
+    if len(args) != 1:
+        current = list_subscriptions(chat_id)
+        lines = ["all ruggers" if r == ALL_RUGGERS else f"`{r}`" for r in current]
+        header = "*🔔 Your alert subscriptions*\n" + "\n".join(f"• {l}" for l in lines) if current else "No alert subscription."
+        await update.message.reply_text(f"{header}\n\n{USAGE}", parse_mode="Markdown")
+        return
+    rugger, error = _target(args)
+    if error:
+        await update.message.reply_text(error)
+        return
+    if rugger != ALL_RUGGERS and not address_exists(rugger):
+        await update.message.reply_text("This address is not in the rugger registry.")
+        return
+    current = list_subscriptions(chat_id)
+    if rugger not in current and len(current) >= MAX_SUBSCRIPTIONS_PER_CHAT:
+        await update.message.reply_text(f"You can have at most {MAX_SUBSCRIPTIONS_PER_CHAT} subscriptions.")
+        return
+    if subscribe(chat_id, rugger):
+        what = "every registered rugger" if rugger == ALL_RUGGERS else f"`{rugger}`"
+        await update.message.reply_text(f"🔔 You will receive alerts for {what}.", parse_mode="Markdown")
+    else:
+        await update.message.reply_text("Already subscribed.")
+
+
+async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/unsubscribe [all|<rugger>]: stops one subscription, or all of them without argument."""
+    chat_id = update.effective_chat.id
+    args = context.args or []
+    if not args:
+        removed = unsubscribe(chat_id)
+        await update.message.reply_text(f"🔕 Unsubscribed ({removed} subscription{'s' if removed != 1 else ''} removed).")
+        return
+    rugger, error = _target(args)
+    if error:
+        await update.message.reply_text(error)
+        return
+    if unsubscribe(chat_id, rugger):
+        await update.message.reply_text("🔕 Subscription removed.")
+    else:
+        await update.message.reply_text("No such subscription.")
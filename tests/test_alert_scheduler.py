@@ -0,0 +1,66 @@
+"""
+Checks that DMs fanned out by the alert scheduler, together with the bot's
+other messages going through TelegramRateLimiter, never exceed
+DM_GLOBAL_RATE sends in any 1 s window.
+
+Run with `python -m pytest tests` or `python tests/test_alert_scheduler.py`.
+"""
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from alert_scheduler import AlertScheduler, TelegramRateLimiter, DM_GLOBAL_RATE
+
+
+class FakeBot:
+    def __init__(self, sends):
+        self.sends = sends
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sends.append(time.monotonic())
+
+
+def max_per_window(times, window=1.0):
+    times = sorted(times)
+    best = start = 0
+    for end, t in enumerate(times):
+        while t - times[start] >= window:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+
+async def _fan_out(chats, alerts, other_messages):
+    sends = []
+    scheduler = AlertScheduler()
+    limiter = TelegramRateLimiter(scheduler)
+    scheduler.start(FakeBot(sends))
+
+    async def other():
+        # Alerte du canal / réponse de sweep passant par le rate limiter de PTB
+        async def post(*args, **kwargs):
+            sends.append(time.monotonic())
+        await limiter.process_request(post, (), {}, "sendMessage", {}, None)
+
+    for i in range(alerts):
+        scheduler.submit([f"chat{c}" for c in range(chats)], f"alert {i}")
+    others = [asyncio.create_task(other()) for _ in range(other_messages)]
+    await asyncio.gather(*others)
+    while len(scheduler) or scheduler._sends:
+        await asyncio.sleep(0.05)
+    await scheduler.stop()
+    return sends
+
+
+def test_global_rate_is_never_exceeded():
+    sends = asyncio.run(_fan_out(chats=62, alerts=2, other_messages=10))
+    assert len(sends) == 62 * 2 + 10
+    assert max_per_window(sends) <= DM_GLOBAL_RATE
+
+
+if __name__ == "__main__":
+    test_global_rate_is_never_exceeded()
+    print("ok")
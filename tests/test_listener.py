@@ -0,0 +1,89 @@
+"""
+Checks that the PumpPortal listener keeps reading frames while Telegram
+sends are held back by the rate limiter (e.g. paused after a 429), so the
+websocket pongs are still read and the connection is not dropped.
+
+Run with `python -m pytest tests` or `python tests/test_listener.py`.
+"""
+import os
+import sys
+import json
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Bases SQLite du test dans un répertoire temporaire, pas dans data/
+_tmp = tempfile.mkdtemp()
+for name in ("REGISTRY_DB", "KEYS_DB", "AUTOSWEEP_DB", "SUBSCRIPTIONS_DB"):
+    os.environ[name] = os.path.join(_tmp, f"{name.lower()}.sqlite")
+
+import wallet  # noqa: F401  (pumpportal doit être importé après wallet)
+import pumpportal
+from alert_scheduler import AlertScheduler, TelegramRateLimiter
+from rugger_index import rugger_index
+
+RUGGER = "7YttLkHDoNj9wyDur5pM1ejNaAvT9X4eqaYcHQqtj2G5"
+
+
+class Exhausted(Exception):
+    pass
+
+
+class FakeWebSocket:
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.read = 0
+
+    async def recv(self, decode=None):
+        if self.read == len(self.frames):
+            raise Exhausted()
+        self.read += 1
+        return self.frames[self.read - 1]
+
+
+class LimitedBot:
+    """Sends go through TelegramRateLimiter, like ExtBot(rate_limiter=...)."""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.sends = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        async def post():
+            self.sends.append(chat_id)
+        await self.limiter.process_request(post, (), {}, "sendMessage", {}, None)
+
+
+def _create_frame(i):
+    return json.dumps({
+        "txType": "create", "traderPublicKey": RUGGER, "signature": f"sig{i}",
+        "mint": f"mint{i}", "name": "Token", "symbol": "TKN", "marketCapSol": 30,
+    }).encode()
+
+
+async def _consume_while_paused(frames):
+    scheduler = AlertScheduler()
+    scheduler.pause(30)
+    bot = LimitedBot(TelegramRateLimiter(scheduler))
+    websocket = FakeWebSocket(_create_frame(i) for i in range(frames))
+    rugger_index.add(RUGGER)
+    try:
+        await asyncio.wait_for(pumpportal._consume(bot, websocket, pumpportal.SignatureLRU()), 2)
+    except Exhausted:
+        pass
+    pending = len(pumpportal._alert_tasks)
+    await pumpportal.stop_alerts()
+    return websocket.read, pending, bot.sends
+
+
+def test_consume_keeps_reading_while_limiter_is_paused():
+    read, pending, sends = asyncio.run(_consume_while_paused(frames=20))
+    assert read == 20
+    assert pending == 20
+    assert sends == []
+
+
+if __name__ == "__main__":
+    test_consume_keeps_reading_while_limiter_is_paused()
+    print("ok")
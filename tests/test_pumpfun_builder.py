@@ -0,0 +1,45 @@
+"""
+Checks offline that the local pump.fun buy builder compiles the same message,
+byte for byte, as recorded PumpPortal trade-local transactions.
+
+Each fixture in tests/fixtures/pumpfun_builder/ holds a trade-local response
+and the bonding-curve account it was built against; record new ones with
+`python tools/compare_pumpfun_builder.py <pubkey> <mint> <amount_sol> --save-fixture <file>`.
+
+Run with `python -m pytest tests` or `python tests/test_pumpfun_builder.py`.
+"""
+import os
+import sys
+import glob
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tools"))
+
+from solders.transaction import VersionedTransaction
+
+from compare_pumpfun_builder import load_fixture, local_message
+
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "fixtures", "pumpfun_builder", "*.json")))
+
+
+def check_fixture(path):
+    args, curve_account, raw = load_fixture(path)
+    remote = VersionedTransaction.from_bytes(raw).message
+    local = local_message(args, curve_account, remote)
+    assert bytes(local) == bytes(remote), f"{os.path.basename(path)} : message local différent de trade-local"
+
+
+def test_matches_recorded_trade_local():
+    if not FIXTURES:
+        import pytest
+        pytest.skip("aucune fixture trade-local enregistrée")
+    for path in FIXTURES:
+        check_fixture(path)
+
+
+if __name__ == "__main__":
+    if not FIXTURES:
+        print("skipped: aucune fixture trade-local enregistrée")
+    for path in FIXTURES:
+        check_fixture(path)
+        print(f"ok {os.path.basename(path)}")
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+
+from solders.pubkey import Pubkey
+
+from rpc_pool import rpc_pool
+from pumpfun import associated_token_address
+
+RUGSWEEPER_MINT = "8DceEqiRgGMsgWgev5WUVxRUad8r7jeDi4BRQ7LDsgK4"
+MIN_HOLDING = 300_000
+
+# Durée de validité des statuts en cache (un non-détenteur est revérifié plus vite)
+GATE_TTL = float(os.getenv("TOKEN_GATE_TTL", "600"))
+GATE_NEGATIVE_TTL = float(os.getenv("TOKEN_GATE_NEGATIVE_TTL", "30"))
+REFRESH_INTERVAL = float(os.getenv("TOKEN_GATE_REFRESH_INTERVAL", "120"))
+# Limite de comptes par appel getMultipleAccounts
+BATCH_SIZE = 100
+# Vérifications getTokenAccountsByOwner simultanées pour les détenteurs dont l'ATA ne suffit plus
+LIVE_CHECK_CONCURRENCY = 8
+
+
+def _ui_amount(account):
+    if not account:
+        return 0.0
+    return float(account["data"]["parsed"]["info"]["tokenAmount"]["uiAmount"] or 0)
+
+
+class TokenGate:
+    """
+    In-memory $RugSweeper holding status per wallet, with TTL.
+
+    A background task refreshes every known wallet in batches by reading their
+    associated token accounts with getMultipleAccounts (holders whose ATA falls
+    short are re-checked across all their token accounts); sweeps read the cache
+    and only fall back to a live getTokenAccountsByOwner when it is cold.
+    """
+
+    def __init__(self, mint=RUGSWEEPER_MINT, min_amount=MIN_HOLDING):
+        self.mint = mint
+        self.min_amount = min_amount
+        self._status = {}  # owner -> (eligible, expires_at)
+        self._task = None
+
+    def _store(self, owner, amount):
+        eligible = amount >= self.min_amount
+        ttl = GATE_TTL if eligible else GATE_NEGATIVE_TTL
+        self._status[owner] = (eligible, time.monotonic() + ttl)
+        return eligible
+
+    def cached(self, owner):
+        """Returns True/False from the cache, or None if unknown or expired."""
+        entry = self._status.get(owner)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    async def check_live(self, owner):
+        result = await rpc_pool.call(
+            "getTokenAccountsByOwner",
+            [owner, {"mint": self.mint}, {"encoding": "jsonParsed"}],
+        )
+        amount = max((_ui_amount(acc["account"]) for acc in result.get("value", [])), default=0.0)
+        return self._store(owner, amount)
+
+    async def is_eligible(self, owner):
+        eligible = self.cached(owner)
+        if eligible is None:
+            eligible = await self.check_live(owner)
+        return eligible
+
+    async def refresh(self, owners):
+        """
+        Refreshes the status of `owners` in batches of BATCH_SIZE associated
+        token accounts. Holders whose ATA no longer holds enough are re-checked
+        with getTokenAccountsByOwner, like a live check, so tokens held in
+        another account still count; other non-holders are left to the negative
+        TTL and to the live check of a cold cache in is_eligible.
+        """
+        owners = list(owners)
+        mint = Pubkey.from_string(self.mint)
+        semaphore = asyncio.Semaphore(LIVE_CHECK_CONCURRENCY)
+
+        async def check(owner):
+            async with semaphore:
+                try:
+                    await self.check_live(owner)
+                except Exception as e:
+                    # Statut précédent conservé jusqu'au prochain cycle
+                    print(f"Erreur lors de la vérification du token gate pour {owner} : {e}")
+
+        for i in range(0, len(owners), BATCH_SIZE):
+            chunk = owners[i:i + BATCH_SIZE]
+            atas = [str(associated_token_address(Pubkey.from_string(o), mint)) for o in chunk]
+            result = await rpc_pool.call("getMultipleAccounts", [atas, {"encoding": "jsonParsed"}])
+            dropped = []
+            for owner, account in zip(chunk, result["value"]):
+                amount = _ui_amount(account)
+                if amount < self.min_amount and self._status.get(owner, (False,))[0]:
+                    # Détenteur dont l'ATA vient de baisser : ses autres comptes peuvent encore suffire
+                    dropped.append(owner)
+                else:
+                    self._store(owner, amount)
+            await asyncio.gather(*(check(owner) for owner in dropped))
+
+    async def _run(self, owners_provider):
+        while True:
+            try:
+                owners = await asyncio.to_thread(owners_provider)
+                await self.refresh(owners)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erreur lors du rafraîchissement du token gate : {e}")
+            await asyncio.sleep(REFRESH_INTERVAL)
+
+    def start(self, owners_provider):
+        """Starts the background refresh; `owners_provider()` returns the wallets to check."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(owners_provider))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+token_gate = TokenGate()
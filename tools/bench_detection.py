@@ -0,0 +1,255 @@
+"""
+Detection-latency benchmark for the PumpPortal listener.
+
+Starts, in a separate process, a local websocket server speaking PumpPortal's
+subscribeNewToken protocol and a local stand-in for the Telegram Bot API. The
+real `fetch_new_tokens` runs against them with a `Bot` pointed at the stand-in.
+Synthetic create events are replayed at each requested rate with the given
+rugger hit ratio; the stand-in measures the time from frame sent to
+sendMessage received.
+
+Usage:
+    python tools/bench_detection.py [--rates 1000,5000,20000] [--hit-ratio 0.01]
+                                    [--duration 5] [--ruggers 1000] [--max-p99-ms 250]
+
+A rate is "sustained" when the server managed to push >=95% of the target
+frames, every hit produced exactly one alert and p99 stayed below --max-p99-ms.
+A second phase measures send_telegram_message alone (alerts/s and latency).
+"""
+import os
+import sys
+import json
+import time
+import random
+import string
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+BENCH_TOKEN = "123456:BENCH"
+CHANNEL_ID = "-1001"
+B58 = "".join(c for c in string.ascii_letters + string.digits if c not in "0OIl")
+
+
+def random_address(rng):
+    return "".join(rng.choice(B58) for _ in range(44))
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def make_event(rng, trader, seq):
+    return json.dumps({
+        "signature": f"bench{seq}" + "".join(rng.choice(B58) for _ in range(40)),
+        "mint": random_address(rng)[:40] + "pump",
+        "traderPublicKey": trader,
+        "txType": "create",
+        "initialBuy": 51_000_000.0,
+        "solAmount": 1.5,
+        "bondingCurveKey": random_address(rng),
+        "vTokensInBondingCurve": 1_021_000_000.0,
+        "vSolInBondingCurve": 31.5,
+        "marketCapSol": 30.85,
+        "name": f"bench-{seq}",
+        "symbol": "BNCH",
+        "uri": "https://ipfs.io/ipfs/bench",
+        "pool": "pump",
+    }, separators=(",", ":"))
+
+
+# --- Processus des services simulés (websocket PumpPortal + API Telegram) ---
+
+def services_main(conn, ws_port, tg_port, ruggers):
+    asyncio.run(_services(conn, ws_port, tg_port, ruggers))
+
+
+async def _services(conn, ws_port, tg_port, ruggers):
+    import websockets
+    from aiohttp import web
+
+    rng = random.Random(1)
+    sent_at = {}
+    latencies = []
+    alerts = {"count": 0}
+    subscribers = []
+    subscribed = asyncio.Event()
+    # Pool de frames non-ruggers pré-générées pour que le générateur tienne les hauts débits
+    noise = [make_event(rng, random_address(rng), -i) for i in range(2000)]
+
+    async def ws_handler(websocket):
+        async for message in websocket:
+            if json.loads(message).get("method") == "subscribeNewToken":
+                subscribers.append(websocket)
+                subscribed.set()
+
+    async def telegram(request):
+        method = request.match_info["method"]
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}})
+        data = dict(await request.post()) or await request.json()
+        text = data.get("text", "")
+        marker = text.find("bench-")
+        if marker >= 0:
+            seq = int(text[marker + 6:].split("`", 1)[0])
+            if seq in sent_at:
+                latencies.append(time.perf_counter() - sent_at.pop(seq))
+            alerts["count"] += 1
+        return web.json_response({"ok": True, "result": {
+            "message_id": alerts["count"], "date": int(time.time()),
+            "chat": {"id": int(CHANNEL_ID), "type": "channel"}, "text": text}})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", telegram)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", tg_port).start()
+
+    async def run(rate, hit_ratio, duration):
+        sent_at.clear()
+        latencies.clear()
+        alerts["count"] = 0
+        websocket = subscribers[-1]
+        total = int(rate * duration)
+        sent = hits = 0
+        start = time.perf_counter()
+        while sent < total:
+            due = min(total, int((time.perf_counter() - start) * rate) + 1)
+            while sent < due:
+                if rng.random() < hit_ratio:
+                    hits += 1
+                    frame = make_event(rng, rng.choice(ruggers), sent)
+                    sent_at[sent] = time.perf_counter()
+                else:
+                    frame = noise[sent % len(noise)]
+                await websocket.send(frame)
+                sent += 1
+            await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        # Laisse le temps aux dernières alertes d'arriver
+        deadline = time.perf_counter() + 5
+        while alerts["count"] < hits and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        return {"target": rate, "achieved": sent / elapsed, "hits": hits,
+                "alerts": alerts["count"], "latencies": list(latencies)}
+
+    async with websockets.serve(ws_handler, "127.0.0.1", ws_port, max_queue=None):
+        loop = asyncio.get_running_loop()
+        conn.send("ready")
+        while True:
+            command = await loop.run_in_executor(None, conn.recv)
+            if command[0] == "wait_subscribed":
+                await subscribed.wait()
+                conn.send("subscribed")
+            elif command[0] == "run":
+                conn.send(await run(*command[1:]))
+            else:
+                break
+    await runner.cleanup()
+
+
+# --- Processus du bot (listener réel) ---
+
+async def bench(args, conn, tg_port, ruggers):
+    from telegram import Bot
+    import wallet  # noqa: F401  (ordre d'import wallet -> pumpportal)
+    import utils
+    import pumpportal
+
+    for address in ruggers:
+        utils.save_address(address)
+
+    loop = asyncio.get_running_loop()
+    async with Bot(BENCH_TOKEN, base_url=f"http://127.0.0.1:{tg_port}/bot") as bot:
+        listener = asyncio.create_task(pumpportal.fetch_new_tokens(bot))
+        conn.send(("wait_subscribed",))
+        await loop.run_in_executor(None, conn.recv)
+
+        print("fetch_new_tokens (detection -> sendMessage)")
+        print(f"{'target/s':>10} {'achieved/s':>11} {'hits':>6} {'alerts':>7} {'p50 ms':>8} {'p99 ms':>8}  sustained")
+        best = 0
+        for rate in args.rates:
+            conn.send(("run", rate, args.hit_ratio, args.duration))
+            stats = await loop.run_in_executor(None, conn.recv)
+            p50 = percentile(stats["latencies"], 0.5) * 1000
+            p99 = percentile(stats["latencies"], 0.99) * 1000
+            sustained = (
+                stats["achieved"] >= 0.95 * rate
+                and stats["alerts"] == stats["hits"]
+                and (not stats["latencies"] or p99 <= args.max_p99_ms)
+            )
+            if sustained:
+                best = max(best, rate)
+            print(f"{rate:>10} {stats['achieved']:>11.0f} {stats['hits']:>6} {stats['alerts']:>7} "
+                  f"{p50:>8.1f} {p99:>8.1f}  {'yes' if sustained else 'no'}")
+        print(f"max sustained rate: {best} frames/s" if best else "max sustained rate: none of the tested rates")
+
+        listener.cancel()
+        try:
+            await listener
+        except asyncio.CancelledError:
+            pass
+
+        print("\nsend_telegram_message")
+        semaphore = asyncio.Semaphore(args.send_concurrency)
+        send_latencies = []
+
+        async def send_one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                await pumpportal.send_telegram_message(
+                    bot, f"send-{i}", "BNCH", ruggers[0], "Mint" + str(i), 30.0, 1.0, 1.5, f"sig{i}"
+                )
+                send_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send_one(i) for i in range(args.send_count)))
+        elapsed = time.perf_counter() - start
+        print(f"{args.send_count} alerts, concurrency {args.send_concurrency}: {args.send_count / elapsed:.0f}/s, "
+              f"p50 {percentile(send_latencies, 0.5) * 1000:.1f} ms, p99 {percentile(send_latencies, 0.99) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rates", type=lambda s: [int(r) for r in s.split(",")], default=[1000, 5000, 20000])
+    parser.add_argument("--hit-ratio", type=float, default=0.01)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--ruggers", type=int, default=1000)
+    parser.add_argument("--max-p99-ms", type=float, default=250)
+    parser.add_argument("--send-count", type=int, default=2000)
+    parser.add_argument("--send-concurrency", type=int, default=32)
+    parser.add_argument("--ws-port", type=int, default=18765)
+    parser.add_argument("--tg-port", type=int, default=18766)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    ruggers = [random_address(rng) for _ in range(args.ruggers)]
+
+    # Le listener lit ces variables à l'import
+    os.environ["PUMPPORTAL_WS_URI"] = f"ws://127.0.0.1:{args.ws_port}"
+    os.environ["PUMPPORTAL_MODE"] = "firehose"
+    os.environ["TELEGRAM_CHANNEL_ID"] = CHANNEL_ID
+    os.environ["REGISTRY_DB"] = os.path.join(tempfile.mkdtemp(), "registry.db")
+
+    parent, child = multiprocessing.Pipe()
+    services = multiprocessing.Process(
+        target=services_main, args=(child, args.ws_port, args.tg_port, ruggers), daemon=True
+    )
+    services.start()
+    parent.recv()  # "ready"
+    try:
+        asyncio.run(bench(args, parent, args.tg_port, ruggers))
+    finally:
+        parent.send(("stop",))
+        services.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
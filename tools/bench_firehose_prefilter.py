@@ -0,0 +1,104 @@
+"""
+Frames/sec per core of the firehose hot path, before and after the prefilter.
+
+Usage:
+    python tools/bench_firehose_prefilter.py [--frames 200000] [--ruggers 1000] [--hit-ratio 0.001]
+
+"before" is the former path (json.loads of every frame, then txType/trader checks);
+"after" is firehose.decode_if_match (byte scan + index lookup, full decode on hits only).
+The rugger index is the real RuggerIndex backed by a temporary registry database.
+"""
+import os
+import sys
+import json
+import time
+import random
+import string
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ["REGISTRY_DB"] = os.path.join(tempfile.mkdtemp(), "registry.db")
+
+import firehose
+import utils
+from rugger_index import rugger_index
+
+B58 = "".join(c for c in string.ascii_letters + string.digits if c not in "0OIl")
+
+
+def random_address(rng):
+    return "".join(rng.choice(B58) for _ in range(44))
+
+
+def make_frame(rng, trader):
+    return json.dumps({
+        "signature": "".join(rng.choice(B58) for _ in range(88)),
+        "mint": random_address(rng)[:40] + "pump",
+        "traderPublicKey": trader,
+        "txType": "create",
+        "initialBuy": rng.uniform(0, 8e7),
+        "solAmount": rng.uniform(0, 3),
+        "bondingCurveKey": random_address(rng),
+        "vTokensInBondingCurve": rng.uniform(9e8, 1.07e9),
+        "vSolInBondingCurve": rng.uniform(30, 33),
+        "marketCapSol": rng.uniform(27, 40),
+        "name": "Token " + "".join(rng.choice(string.ascii_letters) for _ in range(8)),
+        "symbol": "".join(rng.choice(string.ascii_uppercase) for _ in range(4)),
+        "uri": "https://ipfs.io/ipfs/" + "".join(rng.choice(B58) for _ in range(46)),
+        "pool": "pump",
+    }, separators=(",", ":")).encode()
+
+
+def before(frames, index):
+    hits = 0
+    for frame in frames:
+        data = json.loads(frame)
+        if isinstance(data, dict) and data.get("txType") == "create" and data.get("traderPublicKey") in index:
+            hits += 1
+    return hits
+
+
+def after(frames, index):
+    hits = 0
+    for frame in frames:
+        data = firehose.decode_if_match(frame, index)
+        if data is not None and data.get("txType") == "create":
+            hits += 1
+    return hits
+
+
+def measure(fn, frames, index):
+    start = time.perf_counter()
+    hits = fn(frames, index)
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed, hits
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=200_000)
+    parser.add_argument("--ruggers", type=int, default=1000)
+    parser.add_argument("--hit-ratio", type=float, default=0.001)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    ruggers = [random_address(rng) for _ in range(args.ruggers)]
+    for address in ruggers:
+        utils.save_address(address)
+    frames = [
+        make_frame(rng, rng.choice(ruggers) if rng.random() < args.hit_ratio else random_address(rng))
+        for _ in range(args.frames)
+    ]
+
+    before_rate, before_hits = measure(before, frames, rugger_index)
+    after_rate, after_hits = measure(after, frames, rugger_index)
+    assert before_hits == after_hits, (before_hits, after_hits)
+    decoder = "orjson" if firehose.loads is not json.loads else "json"
+    print(f"frames: {len(frames)}, ruggers: {len(ruggers)}, hits: {after_hits}, decoder: {decoder}")
+    print(f"before: {before_rate:,.0f} frames/s")
+    print(f"after:  {after_rate:,.0f} frames/s ({after_rate / before_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Microbenchmarks of the registry, crypto and handler hot functions.
+
+Usage:
+    python tools/bench_micro.py [--sizes 100,10000,1000000] [--output bench.json] [--min-time 0.2]
+
+Registry functions run against temporary databases pre-filled with each size;
+wallet functions against a temporary key store with a random FERNET_SALT.
+Results are printed and, with --output, written as JSON (one entry per
+benchmark: name, registry size, calls, mean and min in microseconds) so two
+runs can be diffed between releases.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import string
+import argparse
+import platform
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+TMP = tempfile.mkdtemp()
+os.environ["REGISTRY_DB"] = os.path.join(TMP, "registry.db")
+os.environ["KEYS_DB"] = os.path.join(TMP, "keys.db")
+os.environ["FERNET_SALT"] = base64.b64encode(os.urandom(16)).decode()
+
+from solders.keypair import Keypair
+
+import wallet
+import utils
+import keystore
+import handlers
+import pumpportal
+
+B58 = "".join(c for c in string.ascii_letters + string.digits if c not in "0OIl")
+
+
+def random_address(rng):
+    return "".join(rng.choice(B58) for _ in range(44))
+
+
+def measure(fn, min_time, max_calls=100_000):
+    """Calls fn until min_time has elapsed (at least once); returns (calls, mean_s, min_s)."""
+    timings = []
+    deadline = time.perf_counter() + min_time
+    while not timings or (time.perf_counter() < deadline and len(timings) < max_calls):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return len(timings), sum(timings) / len(timings), min(timings)
+
+
+def fill_registry(path, size, rng):
+    """Points utils at a fresh database holding `size` ruggers; returns a sample of their addresses."""
+    utils.REGISTRY_DB = path
+    conn = utils._registry()
+    now = time.time()
+    addresses = []
+    with conn:
+        for start in range(0, size, 50_000):
+            batch = [random_address(rng) for _ in range(min(50_000, size - start))]
+            if len(addresses) < 1000:
+                addresses.extend(batch[:1000 - len(addresses)])
+            conn.executemany(
+                "INSERT OR IGNORE INTO ruggers (address, pumpfun_link, count, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(a, f"https://pump.fun/profile/{a[:8]}?tab=coins", rng.randint(1, 20), now, now) for a in batch],
+            )
+    return addresses
+
+
+def registry_benchmarks(size, rng):
+    existing = fill_registry(os.path.join(TMP, f"registry-{size}.db"), size, rng)
+    fresh = iter([random_address(rng) for _ in range(200_000)])
+    pick = lambda: rng.choice(existing)
+
+    def add_rug_known():
+        # Chemin add_rug pour une adresse déjà connue : vérification puis incrément
+        address = pick()
+        if utils.address_exists(address):
+            utils.save_address(address)
+
+    def render_cold():
+        handlers._page_cache.clear()
+        handlers._page_cache_version = None
+        handlers.render_rugger_page()
+
+    def render_last_page():
+        # Curseur de la dernière page, rendue sans cache : coût d'une page profonde
+        key = tuple(utils._registry().execute(
+            "SELECT count, rowid FROM ruggers ORDER BY count, rowid LIMIT 1 OFFSET ?", (handlers.RUGGERS_PAGE_SIZE,)
+        ).fetchone())
+        handlers._page_cache.clear()
+        handlers.render_rugger_page("count", (size - 1) // handlers.RUGGERS_PAGE_SIZE, after=key)
+
+    return {
+        "load_addresses": utils.load_addresses,
+        "address_exists.hit": lambda: utils.address_exists(pick()),
+        "address_exists.miss": lambda: utils.address_exists(next(fresh)),
+        "save_address.new": lambda: utils.save_address(next(fresh)),
+        "save_address.existing": lambda: utils.save_address(pick()),
+        "add_rug.existing": add_rug_known,
+        "count_addresses": utils.count_addresses,
+        "render_rugger_page.cold": render_cold,
+        "render_rugger_page.warm": handlers.render_rugger_page,
+        "render_rugger_page.last_page": render_last_page,
+    }
+
+
+def wallet_benchmarks():
+    key = wallet.get_encryption_key()
+    privkey = str(Keypair())
+    token = wallet.encrypt_privkey(privkey, key)
+    salt = wallet.load_salt()
+    user_id = "1000"
+    keypair = Keypair()
+    keystore.put(user_id, wallet.encrypt_privkey(str(keypair), key), str(keypair.pubkey()))
+
+    def wallet_cold():
+        wallet.keypair_cache.invalidate(user_id)
+        wallet.get_wallet_for_user(user_id)
+
+    return {
+        "derive_key": lambda: wallet.derive_key("", salt),
+        "get_encryption_key": wallet.get_encryption_key,
+        "encrypt_privkey": lambda: wallet.encrypt_privkey(privkey, key),
+        "decrypt_privkey": lambda: wallet.decrypt_privkey(token, key),
+        "get_wallet_for_user.cold": wallet_cold,
+        "get_wallet_for_user.warm": lambda: wallet.get_wallet_for_user(user_id),
+        "get_pubkey_for_user": lambda: wallet.get_pubkey_for_user(user_id),
+    }
+
+
+def alert_benchmarks(rng):
+    rugger, mint = random_address(rng), random_address(rng)[:40] + "pump"
+    return {
+        "build_alert_message": lambda: pumpportal.build_alert_message(
+            "Token", "TKN", rugger, mint, 31.2, 51_000_000.0, 1.5, "sig" * 29
+        ),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(__file__), text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=lambda s: [int(n) for n in s.split(",")], default=[100, 10_000, 1_000_000])
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    results = []
+
+    def run(name, fn, size=None):
+        calls, mean, best = measure(fn, args.min_time)
+        results.append({"name": name, "size": size, "calls": calls,
+                        "mean_us": round(mean * 1e6, 2), "min_us": round(best * 1e6, 2)})
+        label = f"{name} [{size}]" if size is not None else name
+        print(f"{label:<42} {mean * 1e6:>12.1f} us  (min {best * 1e6:.1f}, {calls} calls)")
+
+    for size in args.sizes:
+        for name, fn in registry_benchmarks(size, rng).items():
+            run(name, fn, size)
+    for name, fn in wallet_benchmarks().items():
+        run(name, fn)
+    for name, fn in alert_benchmarks(rng).items():
+        run(name, fn)
+
+    if args.output:
+        report = {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nresults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Drives the RPC pool against local stand-in JSON-RPC servers with injected latency and errors.
+
+Usage:
+    python tools/bench_rpc_pool.py [--endpoint 20:0] [--endpoint 5:0.3:429] [--endpoint 80:0.05:503]
+                                   [--requests 2000] [--concurrency 20] [--outage-after 0.5]
+
+Each --endpoint is latency_ms:error_rate[:status] (status 429 by default is
+sent with Retry-After: 1). With --outage-after, the endpoint the pool prefers
+at that point starts answering 503 to everything once that fraction of the
+requests is done.
+Reports how requests were spread, the failovers and the client-side latency.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from aiohttp import web
+
+from http_client import close_clients
+from rpc_pool import RpcPool
+
+BASE_PORT = 18900
+
+
+def parse_endpoint(spec):
+    parts = spec.split(":")
+    return {
+        "latency": float(parts[0]) / 1000,
+        "error_rate": float(parts[1]) if len(parts) > 1 else 0.0,
+        "status": int(parts[2]) if len(parts) > 2 else 429,
+        "down": False,
+    }
+
+
+async def serve(config, port):
+    rng = random.Random(port)
+
+    async def handle(request):
+        body = await request.json()
+        await asyncio.sleep(config["latency"] * rng.uniform(0.8, 1.2))
+        if config["down"]:
+            return web.Response(status=503)
+        if rng.random() < config["error_rate"]:
+            headers = {"Retry-After": "1"} if config["status"] == 429 else {}
+            return web.Response(status=config["status"], headers=headers)
+        result = "ok" if body["method"] == "getHealth" else {"context": {"slot": 1}, "value": port}
+        return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": result})
+
+    app = web.Application()
+    app.router.add_post("/", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--endpoint", action="append", type=parse_endpoint)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--outage-after", type=float, default=None)
+    args = parser.parse_args()
+    configs = args.endpoint or [parse_endpoint(s) for s in ("20:0", "5:0.3:429", "80:0.05:503")]
+
+    runners = [await serve(c, BASE_PORT + i) for i, c in enumerate(configs)]
+    pool = RpcPool([f"http://127.0.0.1:{BASE_PORT + i}/" for i in range(len(configs))], probe_interval=1)
+    pool.start()
+    await asyncio.sleep(0.2)  # première sonde
+
+    served = {}
+    latencies = []
+    errors = 0
+    done = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        nonlocal errors, done
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                port = (await pool.call("getSlot", []))["value"]
+                served[port] = served.get(port, 0) + 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+            done += 1
+            if args.outage_after is not None and done == int(args.requests * args.outage_after):
+                preferred = pool.endpoints.index(pool.ranked()[0])
+                configs[preferred]["down"] = True
+                print(f"outage: endpoint :{BASE_PORT + preferred} now answers 503")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.requests} requests in {elapsed:.2f}s, errors surfaced to callers: {errors}")
+    print(f"latency p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+    for i, (config, endpoint) in enumerate(zip(configs, pool.endpoints)):
+        port = BASE_PORT + i
+        print(f"  :{port} latency {config['latency'] * 1000:.0f} ms, error rate {config['error_rate']:.0%} -> "
+              f"served {served.get(port, 0)}, errors {endpoint.errors} (incl. probes), "
+              f"smoothed {endpoint.latency * 1000 if endpoint.latency else float('nan'):.1f} ms, healthy {endpoint.healthy}")
+
+    await pool.stop()
+    await close_clients()
+    for runner in runners:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+"""
+Compares the local pump.fun buy builder with a PumpPortal trade-local transaction.
+
+Usage:
+    python tools/compare_pumpfun_builder.py <pubkey> <mint> <amount_sol>
+        [--recorded tx.bin] [--curve-state curve.bin] [--save-fixture fixture.json]
+    python tools/compare_pumpfun_builder.py --fixture fixture.json
+
+Without --recorded, the unsigned transaction is fetched live from trade-local;
+without --curve-state, the bonding-curve account is read over RPC. The
+transaction's blockhash is reused, so messages can be compared byte for byte.
+
+--save-fixture records both (the curve is read before and after the
+trade-local call, and the fixture is only written if it did not move) in the
+format replayed offline by --fixture and tests/test_pumpfun_builder.py.
+"""
+import os
+import sys
+import json
+import base64
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from solders.pubkey import Pubkey
+from solders.transaction import VersionedTransaction
+
+import pumpfun
+from http_client import get_client, close_clients
+from transactions import TRADE_LOCAL_URL
+
+
+def describe(message, ix):
+    keys = message.account_keys
+    accounts = [str(keys[i]) for i in ix.accounts]
+    return str(keys[ix.program_id_index]), bytes(ix.data), accounts
+
+
+def load_fixture(path):
+    """Returns (args dict, bonding-curve account data, raw trade-local transaction) from a fixture file."""
+    with open(path) as f:
+        fixture = json.load(f)
+    args = {k: fixture[k] for k in ("pubkey", "mint", "amount_sol", "slippage", "priority_fee")}
+    return args, base64.b64decode(fixture["curve_account"]), base64.b64decode(fixture["transaction"])
+
+
+def save_fixture(path, args, curve_account, raw):
+    fixture = dict(args, curve_account=base64.b64encode(curve_account).decode(),
+                   transaction=base64.b64encode(raw).decode())
+    with open(path, "w") as f:
+        json.dump(fixture, f, indent=2)
+        f.write("\n")
+
+
+def local_message(args, curve_account, remote):
+    """Builds the local buy message for the fixture arguments, reusing the remote blockhash."""
+    state = pumpfun.decode_curve_state(curve_account)
+    return pumpfun.buy_message(
+        Pubkey.from_string(args["pubkey"]), args["mint"], state, args["amount_sol"],
+        args["slippage"], args["priority_fee"], remote.recent_blockhash,
+    )
+
+
+async def fetch_trade_local(args):
+    resp = await get_client().post(TRADE_LOCAL_URL, data={
+        "publicKey": args["pubkey"], "action": "buy", "mint": args["mint"],
+        "amount": str(args["amount_sol"]), "denominatedInSol": "true",
+        "slippage": args["slippage"], "priorityFee": args["priority_fee"], "pool": "pump",
+    })
+    resp.raise_for_status()
+    return resp.content
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pubkey", nargs="?")
+    parser.add_argument("mint", nargs="?")
+    parser.add_argument("amount", type=float, nargs="?")
+    parser.add_argument("--slippage", type=float, default=10)
+    parser.add_argument("--priority-fee", type=float, default=0.001)
+    parser.add_argument("--recorded", help="fichier contenant une réponse trade-local brute")
+    parser.add_argument("--curve-state", help="fichier contenant les données brutes du compte bonding curve")
+    parser.add_argument("--fixture", help="rejoue une fixture enregistrée, sans réseau")
+    parser.add_argument("--save-fixture", help="enregistre la transaction trade-local et la bonding curve")
+    args = parser.parse_args()
+
+    if args.fixture:
+        params, curve_account, raw = load_fixture(args.fixture)
+    else:
+        if args.amount is None:
+            parser.error("pubkey, mint et amount sont requis sans --fixture")
+        params = {"pubkey": args.pubkey, "mint": args.mint, "amount_sol": args.amount,
+                  "slippage": args.slippage, "priority_fee": args.priority_fee}
+        if args.curve_state:
+            with open(args.curve_state, "rb") as f:
+                curve_account = f.read()
+        else:
+            curve_account = await pumpfun.fetch_curve_account(args.mint)
+        if args.recorded:
+            with open(args.recorded, "rb") as f:
+                raw = f.read()
+        else:
+            raw = await fetch_trade_local(params)
+        if curve_account is None:
+            print("Bonding curve introuvable.")
+            await close_clients()
+            return 1
+        if args.save_fixture:
+            # Un achat entre les deux lectures fausserait la comparaison : la fixture ne serait pas rejouable
+            if not args.curve_state and await pumpfun.fetch_curve_account(args.mint) != curve_account:
+                print("La bonding curve a bougé pendant l'enregistrement, relancez.")
+                await close_clients()
+                return 1
+            save_fixture(args.save_fixture, params, curve_account, raw)
+            print(f"Fixture enregistrée dans {args.save_fixture}")
+    remote = VersionedTransaction.from_bytes(raw).message
+    local = local_message(params, curve_account, remote)
+
+    remote_ixs = [describe(remote, ix) for ix in remote.instructions]
+    local_ixs = [describe(local, ix) for ix in local.instructions]
+    mismatches = 0
+    for i in range(max(len(remote_ixs), len(local_ixs))):
+        r = remote_ixs[i] if i < len(remote_ixs) else None
+        l = local_ixs[i] if i < len(local_ixs) else None
+        if r == l:
+            print(f"#{i} OK  {r[0]}")
+            continue
+        mismatches += 1
+        print(f"#{i} DIFF")
+        print(f"   trade-local: {r}")
+        print(f"   local:       {l}")
+    print("Messages identiques." if bytes(remote) == bytes(local) else f"{mismatches} instruction(s) différente(s).")
+    await close_clients()
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,68 @@
+"""
+Posts recorded Telegram `Update` JSON files to the bot's local webhook listener.
+
+Usage:
+    python tools/post_update.py update.json [more.json ...] [--url http://127.0.0.1:8443/telegram]
+                                [--repeat 100] [--concurrency 10]
+
+The secret token is read from WEBHOOK_SECRET (same .env as the bot). Each copy
+gets a fresh update_id so the bot does not drop it as a duplicate.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{os.getenv('WEBHOOK_PORT', '8443')}/{os.getenv('WEBHOOK_PATH', 'telegram')}")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    updates = []
+    for path in args.files:
+        with open(path, "r") as f:
+            updates.append(json.load(f))
+    headers = {}
+    if os.getenv("WEBHOOK_SECRET"):
+        headers["X-Telegram-Bot-Api-Secret-Token"] = os.getenv("WEBHOOK_SECRET")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    statuses = {}
+    next_id = int(time.time())
+
+    async def post(client, update):
+        nonlocal next_id
+        next_id += 1
+        payload = dict(update, update_id=next_id)
+        async with semaphore:
+            start = time.perf_counter()
+            resp = await client.post(args.url, json=payload, headers=headers)
+            latencies.append(time.perf_counter() - start)
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=30) as client:
+        await asyncio.gather(*(post(client, u) for _ in range(args.repeat) for u in updates))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"updates: {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.1f}/s), statuses: {statuses}")
+    print(f"latency p50: {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+          f"p99: {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.1f} ms")
+    return 0 if set(statuses) == {200} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from utils import is_admin
+
+# Nombre de traces gardées en mémoire pour /trace (0 pour désactiver)
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+# Fichier des logs JSON (stderr par défaut)
+TRACE_LOG_FILE = os.getenv("TRACE_LOG_FILE")
+
+TRACE_USAGE = "Usage: /trace [n] shows the last n traces (1-999), /trace <id> shows one trace (at least 4 hex characters)."
+
+_current = contextvars.ContextVar("trace", default=None)
+recent = deque(maxlen=TRACE_BUFFER_SIZE) if TRACE_BUFFER_SIZE > 0 else None
+
+# Une ligne JSON par span/trace, sans le préfixe du logging du bot
+logger = logging.getLogger("trace")
+logger.propagate = False
+logger.setLevel(logging.INFO)
+_handler = logging.FileHandler(TRACE_LOG_FILE) if TRACE_LOG_FILE else logging.StreamHandler()
+_handler.setFormatter(logging.Formatter("%(message)s"))
+logger.addHandler(_handler)
+
+
+def _emit(record):
+    logger.info(json.dumps(record, default=str))
+
+
+class Trace:
+    """One traced operation (e.g. a sweep): correlation id, attributes and timed spans."""
+
+    def __init__(self, name, attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = dict(attrs)
+        self.spans = []
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+            "spans": self.spans,
+        }
+
+
+@contextmanager
+def trace(name, **attrs):
+    """
+    Starts a trace for the `with` block. Spans opened inside it (in the same
+    task, or in threads started with asyncio.to_thread) are attached to it.
+    The finished trace is logged and kept in the ring buffer.
+    """
+    t = Trace(name, attrs)
+    token = _current.set(t)
+    try:
+        yield t
+    except BaseException as e:
+        t.attrs.setdefault("error", repr(e))
+        raise
+    finally:
+        t.duration = time.perf_counter() - t._start
+        _current.reset(token)
+        _emit(dict(event="trace", **t.to_dict()))
+        if recent is not None:
+            recent.append(t)
+
+
+def current_trace_id():
+    t = _current.get()
+    return t.trace_id if t is not None else None
+
+
+def annotate(**attrs):
+    """Adds attributes (outcome, signature...) to the current trace, if any."""
+    t = _current.get()
+    if t is not None:
+        t.attrs.update(attrs)
+
+
+@contextmanager
+def span(name, histogram=None, **attrs):
+    """
+    Times the `with` block as a stage of the current trace. The duration is
+    also observed in `histogram` (labelled stage=name), even outside a trace.
+    """
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        if histogram is not None:
+            histogram.observe(duration, stage=name)
+        t = _current.get()
+        if t is not None:
+            record = {
+                "span": name,
+                "offset_ms": round((start - t._start) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                "status": status,
+                **attrs,
+            }
+            t.spans.append(record)
+            _emit(dict(event="span", trace_id=t.trace_id, trace=t.name, **record))
+
+
+def find(trace_id):
+    if recent is None:
+        return None
+    return next((t for t in reversed(recent) if t.trace_id.startswith(trace_id)), None)
+
+
+def format_trace(t):
+    attrs = " ".join(f"{k}={v}" for k, v in t.attrs.items())
+    lines = [f"{t.trace_id} {t.name} {t.duration * 1000:.0f} ms {attrs}"]
+    for s in sorted(t.spans, key=lambda s: s["offset_ms"]):
+        flag = "" if s["status"] == "ok" else " ❌"
+        lines.append(f"  +{s['offset_ms']:.0f} ms {s['span']}: {s['duration_ms']:.1f} ms{flag}")
+    return "\n".join(lines)
+
+
+async def trace_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin command: /trace [n] lists the last traced sweeps, /trace <id> shows one."""
+    if not is_admin(update.effective_user.id):
+        return
+    if recent is None:
+        await update.message.reply_text("Tracing buffer disabled (TRACE_BUFFER_SIZE=0).")
+        return
+    arg = context.args[0].lower() if context.args else "5"
+    if arg.isdigit() and len(arg) < 4 and int(arg) >= 1:
+        # Nombre de traces borné à la taille du buffer
+        traces = list(recent)[-min(int(arg), len(recent)):] if recent else []
+    elif re.fullmatch(r"[0-9a-f]{4,16}", arg):
+        t = find(arg)
+        traces = [t] if t is not None else []
+    else:
+        await update.message.reply_text(TRACE_USAGE)
+        return
+    if not traces:
+        await update.message.reply_text("No matching trace.")
+        return
+    text = "\n\n".join(format_trace(t) for t in reversed(traces))
+    # Limite de 4096 caractères par message Telegram
+    await update.message.reply_text(text[:4000])
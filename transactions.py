@@ -1,100 +1,237 @@
-import requests
+import os
+import re
+import base64
+import asyncio
+from dataclasses import dataclass
+from typing import Optional
 from dotenv import load_dotenv
 load_dotenv()
 
+import httpx
 from solders.transaction import VersionedTransaction
 from solders.keypair import Keypair
-from solders.commitment_config import CommitmentLevel
-from solders.rpc.requests import SendVersionedTransaction
-from solders.rpc.config import RpcSendTransactionConfig 
-from solana.rpc.async_api import AsyncClient
-import base64
+from http_client import get_client
+from rpc_pool import rpc_pool
+from blockhash import BlockhashCache
+from confirmations import ConfirmationTracker
+from broadcast import Broadcaster, BROADCAST_ENABLED, BROADCAST_RPC_URLS
+from metrics import Histogram
+import tracing
+import pumpfun
+
+TRADE_LOCAL_URL = "https://pumpportal.fun/api/trade-local"
+
+# Nombre maximal de trades simultanés et timeouts par étape (secondes)
+MAX_CONCURRENT_TRADES = int(os.getenv("MAX_CONCURRENT_TRADES", "32"))
+QUEUE_TIMEOUT = float(os.getenv("TRADE_QUEUE_TIMEOUT", "10"))
+TRADE_LOCAL_TIMEOUT = float(os.getenv("TRADE_LOCAL_TIMEOUT", "5"))
+SEND_TIMEOUT = float(os.getenv("TRADE_SEND_TIMEOUT", "10"))
+
+# Codes d'erreur renvoyés dans TradeResult.error_code
+ERR_BUSY = "busy"
+ERR_TIMEOUT = "timeout"
+ERR_HTTP = "http_error"
+ERR_EMPTY_RESPONSE = "empty_response"
+ERR_SIGNING = "signing_error"
+ERR_ACCOUNT_NOT_FOUND = "account_not_found"
+ERR_INSUFFICIENT_LAMPORTS = "insufficient_lamports"
+ERR_RPC = "rpc_error"
+
+_INSUFFICIENT_LAMPORTS_RE = re.compile(r"insufficient lamports (\d+), need (\d+)")
+
+_trade_semaphore = asyncio.Semaphore(MAX_CONCURRENT_TRADES)
+
+SWEEP_STAGE_SECONDS = Histogram(
+    "sweep_stage_duration_seconds", "Duration of each stage of a sweep.", ["stage"]
+)
+
+# Blockhash récent maintenu en arrière-plan pour le builder pump.fun local
+blockhash_cache = BlockhashCache(rpc_pool)
+# Suivi groupé des signatures envoyées jusqu'à confirmation ou expiration
+confirmation_tracker = ConfirmationTracker(rpc_pool)
+# Diffusion parallèle sur plusieurs RPC (SWEEP_BROADCAST=1), rediffusée jusqu'à confirmation
+broadcaster = Broadcaster(
+    [u.strip() for u in BROADCAST_RPC_URLS.split(",") if u.strip()] or [e.url for e in rpc_pool.endpoints],
+    confirmation_tracker,
+)
+
 
-rpc_url = "https://api.mainnet-beta.solana.com"
+@dataclass
+class TradeResult:
+    """Outcome of a trade: signature on success, error code and details otherwise."""
+    success: bool
+    signature: Optional[str] = None
+    error_code: Optional[str] = None
+    message: str = ""
+    lamports_needed: Optional[int] = None
+    lamports_available: Optional[int] = None
+    blockhash: Optional[str] = None
+
+    @property
+    def transaction_url(self):
+        return f"https://solscan.io/tx/{self.signature}" if self.signature else None
+
+
+def _parse_rpc_error(error: dict) -> TradeResult:
+    """Turns a JSON-RPC sendTransaction error into a TradeResult."""
+    data = error.get("data") or {}
+    message = error.get("message", "Erreur RPC inconnue")
+    if data.get("err") == "AccountNotFound":
+        return TradeResult(
+            False,
+            error_code=ERR_ACCOUNT_NOT_FOUND,
+            message="Erreur : AccountNotFound. L'un des comptes nécessaires n'existe pas ou n'a jamais reçu de crédit.",
+        )
+    for line in data.get("logs") or []:
+        m = _INSUFFICIENT_LAMPORTS_RE.search(line)
+        if m:
+            return TradeResult(
+                False,
+                error_code=ERR_INSUFFICIENT_LAMPORTS,
+                message=message,
+                lamports_available=int(m.group(1)),
+                lamports_needed=int(m.group(2)),
+            )
+    return TradeResult(False, error_code=ERR_RPC, message=message)
+
+
+async def _fetch_unsigned_transaction(trade_data: dict):
+    """Stage 1: asks PumpPortal for the unsigned transaction bytes."""
+    response = await get_client().post(url=TRADE_LOCAL_URL, data=trade_data, timeout=TRADE_LOCAL_TIMEOUT)
+    if response.status_code != 200:
+        print(f"Erreur HTTP: {response.status_code}")
+        print(f"Contenu de l'erreur: {response.text}")
+        return None, TradeResult(False, error_code=ERR_HTTP, message=f"Erreur HTTP: {response.status_code}")
+    if len(response.content) == 0:
+        print("Erreur: La réponse est vide")
+        return None, TradeResult(False, error_code=ERR_EMPTY_RESPONSE, message="Erreur: La réponse est vide")
+    return response.content, None
 
-def buy_token(pubKey, mint, keypair, amount, slippage=10, priorityFee=0.001, pool="auto"):
+
+async def send_transaction(tx: VersionedTransaction) -> TradeResult:
     """
-    Achète un token via PumpPortal
-    
-    Args:
-        pubKey (str): L'adresse publique du wallet
-        mint (str): L'adresse du contrat du token à acheter
-        keypair (Keypair or str): Clé privée du wallet (Keypair object ou base58 string)
-        amount (float): Le montant à acheter (en SOL)
-        slippage (int): Le pourcentage de slippage autorisé
-        priorityFee (float): Les frais de priorité à utiliser
-        pool (str): L'exchange sur lequel trader ("pump", "raydium", "pump-amm", etc.)
-    
-    Returns:
-        tuple: (success: bool, message: str)
-    """ 
- 
-    # Préparer les données pour l'API PumpPortal
+    Stage 3: submits a signed transaction through the RPC pool (fastest healthy
+    node, failover on 429/5xx), or to every broadcast endpoint at once when
+    SWEEP_BROADCAST is enabled.
+    """
+    if BROADCAST_ENABLED:
+        body = await broadcaster.send(tx, timeout=SEND_TIMEOUT)
+    else:
+        body = await rpc_pool.request(
+            "sendTransaction",
+            [base64.b64encode(bytes(tx)).decode(), {"encoding": "base64", "preflightCommitment": "confirmed"}],
+            timeout=SEND_TIMEOUT,
+        )
+    if "result" in body:
+        result = TradeResult(True, signature=body["result"])
+        print(f'Transaction: {result.transaction_url}')
+        return result
+    result = _parse_rpc_error(body.get("error") or {})
+    print(f"Erreur lors de l'envoi de la transaction: {result.message}")
+    return result
+
+
+def _with_blockhash(result: TradeResult, tx: VersionedTransaction) -> TradeResult:
+    """Records the transaction's blockhash so its expiry can be detected while confirming."""
+    result.blockhash = str(tx.message.recent_blockhash)
+    return result
+
+
+def _build_local_transaction(mint, keypair, amount, slippage, priorityFee, pool):
+    """
+    Builds the buy locally when the curve state and blockhash are both cached,
+    so the sweep costs a single network hop. Returns None to fall back to trade-local.
+    """
+    if not pumpfun.LOCAL_BUILDER_ENABLED or pool not in ("pump", "auto"):
+        return None
+    blockhash_cache.start()
+    state = pumpfun.cached_curve_state(mint)
+    if state is None or state.complete or not blockhash_cache.is_fresh:
+        return None
+    kp = keypair if isinstance(keypair, Keypair) else Keypair.from_base58_string(keypair)
+    return pumpfun.build_buy_transaction(
+        kp, mint, state, amount, slippage, priorityFee, blockhash_cache.blockhash
+    )
+
+
+async def _buy_token(pubKey, mint, keypair, amount, slippage, priorityFee, pool) -> TradeResult:
+    try:
+        with tracing.span("build_local", SWEEP_STAGE_SECONDS):
+            tx = _build_local_transaction(mint, keypair, amount, slippage, priorityFee, pool)
+    except Exception as e:
+        print(f"Builder pump.fun local indisponible, repli sur trade-local: {e}")
+        tx = None
+    if tx is not None:
+        try:
+            with tracing.span("send", SWEEP_STAGE_SECONDS):
+                return _with_blockhash(await send_transaction(tx), tx)
+        except httpx.TimeoutException:
+            return TradeResult(False, error_code=ERR_TIMEOUT, message="Timeout lors de l'envoi de la transaction")
+
     trade_data = {
         "publicKey": pubKey,
         "action": "buy",
         "mint": mint,
         "amount": str(amount),
-        "denominatedInSol": True,
+        "denominatedInSol": "true",
         "slippage": slippage,
         "priorityFee": priorityFee,
         "pool": pool
     }
-
     print(trade_data)
 
-    response = requests.post(url="https://pumpportal.fun/api/trade-local", data=trade_data)
-
-    if response.status_code != 200:
-        print(f"Erreur HTTP: {response.status_code}")
-        print(f"Contenu de l'erreur: {response.text}")
-        return False, f"Erreur HTTP: {response.status_code}"
-
-    if len(response.content) == 0:
-        print("Erreur: La réponse est vide")
-        return False, "Erreur: La réponse est vide"
-
-    # keypair peut être un objet Keypair ou une string
-    if isinstance(keypair, Keypair):
-        kp = keypair
-    else:
-        kp = Keypair.from_base58_string(keypair)
+    try:
+        with tracing.span("trade_local", SWEEP_STAGE_SECONDS):
+            raw_tx, error = await _fetch_unsigned_transaction(trade_data)
+    except httpx.TimeoutException:
+        return TradeResult(False, error_code=ERR_TIMEOUT, message="Timeout PumpPortal trade-local")
+    if error:
+        return error
 
+    # Stage 2: signature locale
     try:
-        tx = VersionedTransaction(VersionedTransaction.from_bytes(response.content).message, [kp])
+        with tracing.span("sign", SWEEP_STAGE_SECONDS):
+            kp = keypair if isinstance(keypair, Keypair) else Keypair.from_base58_string(keypair)
+            tx = VersionedTransaction(VersionedTransaction.from_bytes(raw_tx).message, [kp])
     except Exception as e:
         print(f"Erreur lors de la création de la transaction: {e}")
-        return False, f"Erreur lors de la création de la transaction: {e}"
+        return TradeResult(False, error_code=ERR_SIGNING, message=f"Erreur lors de la création de la transaction: {e}")
+
+    try:
+        with tracing.span("send", SWEEP_STAGE_SECONDS):
+            return _with_blockhash(await send_transaction(tx), tx)
+    except httpx.TimeoutException:
+        return TradeResult(False, error_code=ERR_TIMEOUT, message="Timeout lors de l'envoi de la transaction")
 
-    commitment = CommitmentLevel.Confirmed
-    config = RpcSendTransactionConfig(preflight_commitment=commitment)
-    txPayload = SendVersionedTransaction(tx, config)
 
-    response = requests.post(
-        url=rpc_url,
-        headers={"Content-Type": "application/json"},
-        data=SendVersionedTransaction(tx, config).to_json()
-    )
+async def buy_token(pubKey, mint, keypair, amount, slippage=10, priorityFee=0.001, pool="auto") -> TradeResult:
+    """
+    Achète un token via PumpPortal
+
+    Plusieurs achats peuvent tourner en parallèle (au plus MAX_CONCURRENT_TRADES) ;
+    chaque étape (trade-local, envoi RPC) a son propre timeout.
 
+    Args:
+        pubKey (str): L'adresse publique du wallet
+        mint (str): L'adresse du contrat du token à acheter
+        keypair (Keypair or str): Clé privée du wallet (Keypair object ou base58 string)
+        amount (float): Le montant à acheter (en SOL)
+        slippage (int): Le pourcentage de slippage autorisé
+        priorityFee (float): Les frais de priorité à utiliser
+        pool (str): L'exchange sur lequel trader ("pump", "raydium", "pump-amm", etc.)
+
+    Returns:
+        TradeResult: signature ou code d'erreur (avec lamports requis/disponibles si connus)
+    """
     try:
-        txSignature = response.json()['result']
-        transaction_url = f'https://solscan.io/tx/{txSignature}'
-        print(f'Transaction: {transaction_url}')
-        return True, transaction_url
-    except Exception as e:
-        try:
-            error_json = response.json()
-            if (
-                "error" in error_json
-                and error_json["error"].get("data", {}).get("err") == "AccountNotFound"
-            ):
-                msg = "Erreur : AccountNotFound. L'un des comptes nécessaires n'existe pas ou n'a jamais reçu de crédit."
-                print(msg)
-                return False, msg
-        except Exception:
-            pass
-        print(f"Erreur lors de la récupération de la signature de transaction: {e} ")
-        print(f"Réponse: {response.text}")
-        return False, f"Erreur lors de la récupération de la signature de transaction: {e}"
- 
- 
\ No newline at end of file
+        with tracing.span("queue", SWEEP_STAGE_SECONDS):
+            await asyncio.wait_for(_trade_semaphore.acquire(), QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return TradeResult(False, error_code=ERR_BUSY, message="Trop de transactions en cours, réessayez.")
+    try:
+        return await _buy_token(pubKey, mint, keypair, amount, slippage, priorityFee, pool)
+    except httpx.HTTPError as e:
+        print(f"Erreur réseau lors du trade: {e}")
+        return TradeResult(False, error_code=ERR_HTTP, message=f"Erreur réseau: {e}")
+    finally:
+        _trade_semaphore.release()
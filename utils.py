@@ -1,37 +1,159 @@
 import os
 import re
 import json
+import time
 
+from storage import get_connection
+
+# Ancien registre JSON, migré une seule fois vers SQLite
 ADRESSES_FILE = "data/adresses.json"
+REGISTRY_DB = os.getenv("REGISTRY_DB", "data/registry.db")
+
+def is_admin(telegram_user_id):
+    """True if the user id is listed in ADMIN_USER_IDS (comma-separated) in the .env."""
+    admins = os.getenv("ADMIN_USER_IDS", "")
+    return str(telegram_user_id) in {a.strip() for a in admins.split(",") if a.strip()}
+
+def _migrate_json(conn):
+    """Imports data/adresses.json into the ruggers table (only once)."""
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+        return
+    if os.path.exists(ADRESSES_FILE):
+        with open(ADRESSES_FILE, "r") as f:
+            data = json.load(f)
+        now = time.time()
+        conn.executemany(
+            "INSERT OR IGNORE INTO ruggers (address, pumpfun_link, count, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(addr, info.get("pumpfun_link", ""), info.get("count", 1), now, now) for addr, info in data.items()],
+        )
+        print(f"Registre migré depuis {ADRESSES_FILE} : {len(data)} adresses")
+    conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', 1)")
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('registry_version', 0)")
+
+def _init_registry(conn):
+    with conn:
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS ruggers (
+                address TEXT PRIMARY KEY,
+                pumpfun_link TEXT NOT NULL DEFAULT '',
+                count INTEGER NOT NULL DEFAULT 1,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            -- Index parcourus à l'envers pour la pagination par clé (valeur, rowid)
+            DROP INDEX IF EXISTS ruggers_by_count;
+            DROP INDEX IF EXISTS ruggers_by_updated;
+            CREATE INDEX IF NOT EXISTS ruggers_by_count_key ON ruggers (count);
+            CREATE INDEX IF NOT EXISTS ruggers_by_updated_key ON ruggers (updated_at);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """
+        )
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _migrate_json(conn)
+
+def _registry():
+    """Returns this thread's registry connection, creating the schema on first use."""
+    return get_connection(REGISTRY_DB, _init_registry)
 
 def load_addresses():
-    if not os.path.exists(ADRESSES_FILE):
-        return {}
-    with open(ADRESSES_FILE, "r") as f:
-        return json.load(f)
+    rows = _registry().execute("SELECT address, pumpfun_link, count FROM ruggers ORDER BY rowid")
+    return {row["address"]: {"pumpfun_link": row["pumpfun_link"], "count": row["count"]} for row in rows}
 
 def load_address_counts():
     data = load_addresses()
     # Retourne un dict : (address, pumpfun_link) -> count
     return {(addr, info.get("pumpfun_link", "")): info.get("count", 1) for addr, info in data.items()}
 
+def get_address(address):
+    """Returns {"pumpfun_link", "count"} for one address, or None."""
+    row = _registry().execute(
+        "SELECT pumpfun_link, count FROM ruggers WHERE address = ?", (address,)
+    ).fetchone()
+    if row is None:
+        return None
+    return {"pumpfun_link": row["pumpfun_link"], "count": row["count"]}
+
+def count_addresses():
+    return _registry().execute("SELECT COUNT(*) FROM ruggers").fetchone()[0]
+
+def registry_version():
+    """Counter bumped by every write; lets caches detect registry changes with one point read."""
+    row = _registry().execute("SELECT value FROM meta WHERE key = 'registry_version'").fetchone()
+    return row[0] if row else 0
+
+def addresses_since(rowid):
+    """Returns [(rowid, address)] for entries inserted after `rowid`."""
+    return _registry().execute(
+        "SELECT rowid, address FROM ruggers WHERE rowid > ? ORDER BY rowid", (rowid,)
+    ).fetchall()
+
+# Tris disponibles pour l'affichage paginé du registre (colonne triée par ordre décroissant,
+# départagée par rowid pour que (valeur, rowid) soit une clé de pagination unique)
+RUGGER_ORDERS = {
+    "count": "count",
+    "recent": "updated_at",
+}
+
+def list_addresses_page(order="count", after=None, before=None, limit=20):
+    """
+    Returns [(address, pumpfun_link, count, key)] for one page of the registry.
+
+    Keyset pagination: `after` is the key of the last row of the previous page,
+    `before` the key of the first row of the next page (None for the first
+    page). Each page costs at most two bounded index range scans, whatever its depth.
+    """
+    column = RUGGER_ORDERS[order]
+    conn = _registry()
+    select = f"SELECT address, pumpfun_link, count, {column} AS sort_value, rowid FROM ruggers"
+    if after is None and before is None:
+        return _page_rows(conn.execute(f"{select} ORDER BY {column} DESC, rowid DESC LIMIT ?", (limit,)))
+    value, rowid = after if after is not None else before
+    op, direction = ("<", "DESC") if after is not None else (">", "ASC")
+    # Deux parcours d'index bornés : la suite des ex aequo de la clé, puis les valeurs suivantes
+    # (une comparaison de row values ne borne l'index que sur la première colonne)
+    rows = conn.execute(
+        f"{select} WHERE {column} = ? AND rowid {op} ? ORDER BY rowid {direction} LIMIT ?", (value, rowid, limit)
+    ).fetchall()
+    if len(rows) < limit:
+        rows += conn.execute(
+            f"{select} WHERE {column} {op} ? ORDER BY {column} {direction}, rowid {direction} LIMIT ?",
+            (value, limit - len(rows)),
+        ).fetchall()
+    return _page_rows(rows if after is not None else rows[::-1])
+
+def _page_rows(rows):
+    return [(row["address"], row["pumpfun_link"], row["count"], (row["sort_value"], row["rowid"])) for row in rows]
+
 def save_address(address, pumpfun_link=""):
-    data = load_addresses()
-    if address in data:
-        # Incrémente le compteur si déjà présent
-        data[address]["count"] = data[address].get("count", 1) + 1
-        # Met à jour le lien pumpfun si fourni et non vide
-        if pumpfun_link:
-            data[address]["pumpfun_link"] = pumpfun_link
-    else:
-        data[address] = {"pumpfun_link": pumpfun_link, "count": 1}
-    with open(ADRESSES_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    """Adds the address or atomically increments its counter; returns the new count."""
+    conn = _registry()
+    now = time.time()
+    with conn:
+        # Incrémente le compteur si déjà présent, met à jour le lien pumpfun si fourni et non vide
+        row = conn.execute(
+            """
+            INSERT INTO ruggers (address, pumpfun_link, count, created_at, updated_at)
+            VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT (address) DO UPDATE SET
+                count = count + 1,
+                pumpfun_link = CASE WHEN excluded.pumpfun_link != '' THEN excluded.pumpfun_link ELSE pumpfun_link END,
+                updated_at = excluded.updated_at
+            RETURNING count
+            """,
+            (address, pumpfun_link, now, now),
+        ).fetchone()
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'registry_version'")
+    # Met à jour l'index en mémoire sans relire la base
+    from rugger_index import rugger_index
+    rugger_index.add(address)
+    return row[0]
 
 def is_valid_solana_address(address):
     pattern = r"^[1-9A-HJ-NP-Za-km-z]{32,44}$"
     return re.match(pattern, address) is not None
 
 def address_exists(address):
-    data = load_addresses()
-    return address in data
+    return _registry().execute("SELECT 1 FROM ruggers WHERE address = ?", (address,)).fetchone() is not None
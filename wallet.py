@@ -1,7 +1,7 @@
+import asyncio
 import base58
 from solders.keypair import Keypair
-from solana.rpc.api import Client
-from telegram import ReplyKeyboardMarkup
+from telegram import ReplyKeyboardMarkup, InputFile
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from cryptography.fernet import Fernet
@@ -9,27 +9,39 @@ import json
 import os
 import base64
 import dotenv
+import threading
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes
 from pumpportal import create_wallet
-import requests
+from balances import get_balances, custodial_balance_report
+from utils import is_admin
+from prices import sol_price
 from solders.pubkey import Pubkey
 from solders.system_program import transfer, TransferParams
 from solders.transaction import Transaction
+from keypair_cache import KeypairCache
+import keystore
+import tracing
 
 WALLET_MENU = 10 
 WAIT_WITHDRAW_ADDRESS = 11
-ENCRYPTED_KEYS_FILE = "data/encrypted_keys.json"
-
-def get_balance(pubkey, rpc_url="https://api.mainnet-beta.solana.com"):
-    client = Client(rpc_url)
-    # Ensure pubkey is a Pubkey object
-    if isinstance(pubkey, str):
-        pubkey = Pubkey.from_string(pubkey)
-    resp = client.get_balance(pubkey)
-    # resp.value is in lamports, convert to SOL
-    if hasattr(resp, "value"):
-        return resp.value / 1e9  # SOL
+ENCRYPTED_KEYS_FILE = keystore.LEGACY_KEYS_FILE
+
+# Clé Fernet dérivée une seule fois par processus (PBKDF2 à 390 000 itérations)
+_encryption_key = None
+_encryption_key_lock = threading.Lock()
+
+keypair_cache = KeypairCache(
+    maxsize=int(os.getenv("KEYPAIR_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("KEYPAIR_CACHE_TTL", "600")),
+)
+
+async def get_balance(pubkey):
+    # Passe par le service de soldes (pool RPC partagé)
+    balances = await get_balances([pubkey])
+    lamports = balances.get(str(pubkey))
+    if lamports is not None:
+        return lamports / 1e9  # SOL
     return None
 
 wallet_keyboard = [
@@ -48,23 +60,15 @@ async def wallet(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     return WALLET_MENU
 
-def save_encrypted_key_for_user(telegram_user_id: str, encrypted_privkey: str):
-    """Sauvegarde la clé privée chiffrée dans un fichier JSON (format: {telegram_user_id: encrypted_privkey})."""
-    if os.path.exists(ENCRYPTED_KEYS_FILE):
-        with open(ENCRYPTED_KEYS_FILE, "r") as f:
-            data = json.load(f)
-    else:
-        data = {}
-    data[telegram_user_id] = encrypted_privkey
-    with open(ENCRYPTED_KEYS_FILE, "w") as f:
-        json.dump(data, f)
+def save_encrypted_key_for_user(telegram_user_id: str, encrypted_privkey: str, pubkey: str = None):
+    """Sauvegarde la clé privée chiffrée dans le key store (un enregistrement par telegram_user_id)."""
+    keystore.put(telegram_user_id, encrypted_privkey, pubkey)
+    keypair_cache.invalidate(telegram_user_id)
 
-def get_sol_price():
-    """Returns the current price of SOL in USD (float)."""
+async def get_sol_price():
+    """Returns the current price of SOL in USD (float), served from a shared TTL cache."""
     try:
-        resp = requests.get("https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd", timeout=5)
-        data = resp.json()
-        return float(data["solana"]["usd"])
+        return await sol_price.get()
     except Exception:
         return None
 
@@ -73,25 +77,19 @@ async def wallet_choice_handler(update: Update, context: ContextTypes.DEFAULT_TY
     
     if text.startswith("Create wallet"):
         telegram_user_id = str(update.effective_user.id)
-        # Load encrypted keys
-        if os.path.exists(ENCRYPTED_KEYS_FILE):
-            with open(ENCRYPTED_KEYS_FILE, "r") as f:
-                encrypted_keys = json.load(f)
-        else:
-            encrypted_keys = {}
-        if telegram_user_id in encrypted_keys:
-            await update.message.reply_text(
-                "You already have a wallet associated with your Telegram account.\nIf you want to reset it, please contact support.",
-                reply_markup=wallet_markup
-            )
+        already_exists_msg = "You already have a wallet associated with your Telegram account.\nIf you want to reset it, please contact support."
+        if keystore.has_wallet(telegram_user_id):
+            await update.message.reply_text(already_exists_msg, reply_markup=wallet_markup)
             return WALLET_MENU
 
-        pubkey, privkey_base58 = create_wallet()
+        pubkey, privkey_base58 = await create_wallet()
         print(pubkey, privkey_base58)
-        salt = load_salt()
-        key = derive_key("", salt)
+        key = get_encryption_key()
         encrypted_privkey = encrypt_privkey(privkey_base58, key)
-        save_encrypted_key_for_user(telegram_user_id, encrypted_privkey)
+        # Insertion atomique : deux clics simultanés ne peuvent pas écraser le même wallet
+        if not keystore.create(telegram_user_id, encrypted_privkey, pubkey):
+            await update.message.reply_text(already_exists_msg, reply_markup=wallet_markup)
+            return WALLET_MENU
         preview = privkey_base58[:4] + "..." + privkey_base58[-4:]
         await update.message.reply_text(
             f"✅ Wallet created\\!\n\n"
@@ -111,9 +109,9 @@ async def wallet_choice_handler(update: Update, context: ContextTypes.DEFAULT_TY
         return WALLET_MENU
     elif text == "Deposit" or text == "Balance":
         telegram_user_id = str(update.effective_user.id)
-        pubkey, privkey_base58 = get_wallet_for_user(telegram_user_id)
-        print(not privkey_base58 or not pubkey)
-        if not privkey_base58 or not pubkey:
+        # Seule l'adresse publique est nécessaire : aucun déchiffrement
+        pubkey = get_pubkey_for_user(telegram_user_id)
+        if not pubkey:
             await update.message.reply_text("No key found for your Telegram account.")
         else:
             try:
@@ -121,8 +119,7 @@ async def wallet_choice_handler(update: Update, context: ContextTypes.DEFAULT_TY
                     f"Your public address: `{pubkey}`",
                     parse_mode="Markdown"
                 )
-                sol_balance = get_balance(pubkey)
-                sol_price = get_sol_price()
+                sol_balance, sol_price = await asyncio.gather(get_balance(pubkey), get_sol_price())
                 if sol_balance is not None and sol_price is not None:
                     dollar_estimate = sol_balance * sol_price
                     await update.message.reply_text(
@@ -190,6 +187,15 @@ def derive_key(password: str, salt: bytes) -> bytes:
     key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
     return key
 
+def get_encryption_key() -> bytes:
+    """Returns the Fernet key derived from FERNET_SALT, computing it only once per process."""
+    global _encryption_key
+    if _encryption_key is None:
+        with _encryption_key_lock:
+            if _encryption_key is None:
+                _encryption_key = derive_key("", load_salt())
+    return _encryption_key
+
 def encrypt_privkey(privkey: str, encryption_key: bytes) -> str:
     """Chiffre la clé privée avec Fernet."""
     f = Fernet(encryption_key)
@@ -203,15 +209,8 @@ def decrypt_privkey(token: str, encryption_key: bytes) -> str:
     return privkey.decode()
 
 def save_encrypted_key(pubkey: str, encrypted_privkey: str):
-    """Sauvegarde la clé privée chiffrée dans un fichier JSON (format: {pubkey: encrypted_privkey})."""
-    if os.path.exists(ENCRYPTED_KEYS_FILE):
-        with open(ENCRYPTED_KEYS_FILE, "r") as f:
-            data = json.load(f)
-    else:
-        data = {}
-    data[pubkey] = encrypted_privkey
-    with open(ENCRYPTED_KEYS_FILE, "w") as f:
-        json.dump(data, f)
+    """Sauvegarde la clé privée chiffrée dans le key store, indexée par pubkey."""
+    keystore.put(pubkey, encrypted_privkey, pubkey)
 
 def is_valid_solana_address(address: str):
     try:
@@ -220,24 +219,80 @@ def is_valid_solana_address(address: str):
     except Exception:
         return False
 
-def get_wallet_for_user(telegram_user_id: str):
+def get_keypair_for_user(telegram_user_id: str):
     """
-    Returns (pubkey, privkey_base58) for the user, or (None, None) if not found.
-    Decrypts the private key and returns the public key (base58 string) and privkey_base58.
+    Returns (pubkey, Keypair) for the user, or (None, None) if not found.
+    Decrypted keypairs are cached (bounded, with TTL) so repeat calls skip the file read and decrypt.
     """
-    if not os.path.exists(ENCRYPTED_KEYS_FILE):
-        return None, None
-    with open(ENCRYPTED_KEYS_FILE, "r") as f:
-        encrypted_keys = json.load(f)
-    encrypted_privkey = encrypted_keys.get(str(telegram_user_id))
+    cached = keypair_cache.get(telegram_user_id)
+    if cached is not None:
+        return cached
+    encrypted_privkey = keystore.get_encrypted_key(telegram_user_id)
     if not encrypted_privkey:
         return None, None
     try:
-        privkey_base58 = decrypt_privkey(encrypted_privkey, derive_key("", load_salt()))
-        pubkey = str(Keypair.from_base58_string(privkey_base58).pubkey())
-        return pubkey, privkey_base58
+        with tracing.span("decrypt"):
+            privkey_base58 = decrypt_privkey(encrypted_privkey, get_encryption_key())
+        with tracing.span("keypair_decode"):
+            keypair = Keypair.from_base58_string(privkey_base58)
     except Exception:
         return None, None
+    keypair_cache.put(telegram_user_id, keypair)
+    pubkey = str(keypair.pubkey())
+    if keystore.get_pubkey(telegram_user_id) != pubkey:
+        keystore.set_pubkey(telegram_user_id, pubkey)
+    return pubkey, keypair
+
+def get_wallet_for_user(telegram_user_id: str):
+    """
+    Returns (pubkey, privkey_base58) for the user, or (None, None) if not found.
+    Decrypts the private key and returns the public key (base58 string) and privkey_base58.
+    """
+    pubkey, keypair = get_keypair_for_user(telegram_user_id)
+    if keypair is None:
+        return None, None
+    return pubkey, str(keypair)
+
+def get_pubkey_for_user(telegram_user_id: str):
+    """Returns the user's public address from the key store index (decrypts only for migrated records)."""
+    pubkey = keystore.get_pubkey(telegram_user_id)
+    if pubkey is None and keystore.has_wallet(telegram_user_id):
+        pubkey, _ = get_keypair_for_user(telegram_user_id)
+    return pubkey
+
+def list_wallets():
+    """Returns {telegram_user_id: pubkey} for every custodial wallet, from the key store index."""
+    wallets = {}
+    for user_id, pubkey in keystore.list_pubkeys().items():
+        if pubkey is None:
+            # Enregistrement migré : la pubkey est calculée une fois puis indexée
+            pubkey = get_pubkey_for_user(user_id)
+        if pubkey:
+            wallets[user_id] = pubkey
+    return wallets
+
+def list_wallet_pubkeys():
+    """Returns the public addresses of every custodial wallet."""
+    return list(list_wallets().values())
+
+async def balances_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin command: balances of all custodial wallets, fetched in batches."""
+    if not is_admin(update.effective_user.id):
+        return
+    wallets = await asyncio.to_thread(list_wallets)
+    if not wallets:
+        await update.message.reply_text("No custodial wallet registered.")
+        return
+    report = await custodial_balance_report(wallets)
+    total = sum(sol for _, _, sol in report)
+    funded = sum(1 for _, _, sol in report if sol > 0)
+    await update.message.reply_text(
+        f"💼 Custodial wallets: {len(report)}\n"
+        f"Funded wallets: {funded}\n"
+        f"Total balance: {total:.4f} SOL"
+    )
+    csv = "telegram_user_id,pubkey,sol\n" + "".join(f"{u},{p},{sol:.9f}\n" for u, p, sol in report)
+    await update.message.reply_document(InputFile(csv.encode(), filename="balances.csv"))
 
 async def wallet_withdraw_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(